@@ -0,0 +1,219 @@
+"""Parquet and Arrow IPC encoding of consumption logs.
+
+Exports are written one record batch at a time so large histories stream to
+the client without being materialized in memory, and imports are read back
+in batches for the background import runner.
+
+Archived days are exported too, one row per day, cylinder and bottle size
+with the summed bottle count and pushes and `log_count` > 1 where several
+logs were merged. Such a row imports back as a single log with the same
+volume and cost, so moving an export keeps the full history's totals.
+"""
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import select
+
+from app import models
+from app.routers.logs import compute_log_hash
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "10000"))
+
+FORMATS = {
+    "parquet": {"extension": ".parquet", "media_type": "application/vnd.apache.parquet"},
+    "arrow": {"extension": ".arrow", "media_type": "application/vnd.apache.arrow.stream"},
+}
+
+EXPORT_SCHEMA = pa.schema([
+    ("date", pa.date32()),
+    ("bottle_size", pa.string()),
+    ("bottle_count", pa.int32()),
+    ("volume_ml", pa.float64()),
+    ("co2_pushes", pa.int32()),
+    ("cylinder_number", pa.int32()),
+    ("cylinder_cost", pa.float64()),
+    ("cylinder_max_pushes", pa.int32()),
+    ("created_at", pa.timestamp("us")),
+    ("row_hash", pa.string()),
+    ("log_count", pa.int32()),
+])
+
+def format_for_filename(filename: str):
+    """Columnar format of an uploaded file from its extension, or None for CSV/unknown"""
+    for fmt, spec in FORMATS.items():
+        if filename.endswith(spec["extension"]):
+            return fmt
+    if filename.endswith(".feather"):
+        return "arrow"
+    return None
+
+class _ByteSink:
+    """Minimal writable file that hands written bytes back to a generator"""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+def export_rows(db, household_id: int):
+    """Yield lists of up to EXPORT_BATCH_SIZE tuples in EXPORT_SCHEMA order:
+    archived daily summaries first, then the household's logs"""
+    archive = models.ConsumptionLogArchive
+    stmt = select(
+        archive.id,
+        archive.date,
+        archive.bottle_size,
+        archive.bottle_count,
+        archive.volume_ml,
+        archive.co2_pushes,
+        models.Cylinder.number,
+        models.Cylinder.cost,
+        models.Cylinder.max_pushes,
+        archive.archived_at,
+        archive.log_count,
+    ).join(models.Cylinder, archive.cylinder_id == models.Cylinder.id).where(
+        archive.household_id == household_id
+    ).order_by(archive.date, archive.id)
+
+    result = db.execute(stmt.execution_options(yield_per=EXPORT_BATCH_SIZE))
+    for rows in result.partitions():
+        yield [
+            (
+                row.date, row.bottle_size, row.bottle_count, row.volume_ml, row.co2_pushes,
+                row.number, row.cost, row.max_pushes, row.archived_at,
+                compute_log_hash(row.date, row.bottle_size, row.bottle_count, row.number, f"archive:{row.id}"),
+                row.log_count,
+            )
+            for row in rows
+        ]
+
+    log = models.ConsumptionLog
+    stmt = select(
+        log.date,
+        log.bottle_size,
+        log.bottle_count,
+        log.volume_ml,
+        log.co2_pushes,
+        models.Cylinder.number,
+        models.Cylinder.cost,
+        models.Cylinder.max_pushes,
+        log.created_at,
+        log.row_hash,
+    ).join(models.Cylinder, log.cylinder_id == models.Cylinder.id).where(
+        log.household_id == household_id
+    ).order_by(log.id)
+
+    result = db.execute(stmt.execution_options(yield_per=EXPORT_BATCH_SIZE))
+    for rows in result.partitions():
+        yield [tuple(row) + (1,) for row in rows]
+
+def _record_batches(db, household_id: int):
+    """Yield a household's export rows as record batches of EXPORT_BATCH_SIZE rows"""
+    for rows in export_rows(db, household_id):
+        columns = list(zip(*rows))
+        yield pa.RecordBatch.from_arrays(
+            [pa.array(values, type=field.type) for values, field in zip(columns, EXPORT_SCHEMA)],
+            schema=EXPORT_SCHEMA
+        )
+
+def stream_export(db, household_id: int, fmt: str):
+    """Encode a household's logs as Parquet or an Arrow IPC stream, yielding bytes per batch"""
+    sink = _ByteSink()
+    if fmt == "parquet":
+        writer = pq.ParquetWriter(sink, EXPORT_SCHEMA, compression="zstd")
+    else:
+        writer = pa.ipc.new_stream(sink, EXPORT_SCHEMA)
+
+    for batch in _record_batches(db, household_id):
+        if fmt == "parquet":
+            # Each batch becomes its own row group so it can be flushed immediately
+            writer.write_table(pa.Table.from_batches([batch]))
+        else:
+            writer.write_batch(batch)
+        yield sink.drain()
+
+    writer.close()
+    yield sink.drain()
+
+def _open_arrow(source):
+    """Reader for an open Arrow IPC file, falling back to the streaming format"""
+    try:
+        return pa.ipc.open_file(source)
+    except pa.ArrowInvalid:
+        source.seek(0)
+        return pa.ipc.open_stream(source)
+
+def _iter_arrow(reader):
+    if isinstance(reader, pa.ipc.RecordBatchFileReader):
+        for i in range(reader.num_record_batches):
+            yield reader.get_batch(i)
+    else:
+        yield from reader
+
+def read_columns(path: str, fmt: str):
+    """Column names of a columnar file, read from its schema only"""
+    if fmt == "parquet":
+        return pq.read_schema(path).names
+    with pa.memory_map(path) as source:
+        return _open_arrow(source).schema.names
+
+def count_rows(path: str, fmt: str) -> int:
+    if fmt == "parquet":
+        with pq.ParquetFile(path) as parquet_file:
+            return parquet_file.metadata.num_rows
+    with pa.memory_map(path) as source:
+        return sum(batch.num_rows for batch in _iter_arrow(_open_arrow(source)))
+
+def _open_batches(path: str, fmt: str, batch_size: int):
+    """Record batches of a file; the file is closed when iteration ends or the generator is closed"""
+    if fmt == "parquet":
+        with pq.ParquetFile(path) as parquet_file:
+            yield from parquet_file.iter_batches(batch_size=batch_size)
+    else:
+        with pa.memory_map(path) as source:
+            yield from _iter_arrow(_open_arrow(source))
+
+def read_batches(path: str, fmt: str, skip: int, batch_size: int):
+    """Yield DataFrames of up to batch_size rows, skipping the first `skip` rows.
+
+    Indexes count rows from the first one yielded, like chunked pd.read_csv.
+    """
+    position = 0
+    batches = _open_batches(path, fmt, batch_size)
+    try:
+        for batch in batches:
+            if position + batch.num_rows <= skip:
+                position += batch.num_rows
+                continue
+            if position < skip:
+                batch = batch.slice(skip - position)
+                position = skip
+            for offset in range(0, batch.num_rows, batch_size):
+                df = batch.slice(offset, batch_size).to_pandas()
+                df.index = pd.RangeIndex(position - skip, position - skip + len(df))
+                position += len(df)
+                yield df
+    finally:
+        batches.close()
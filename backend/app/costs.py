@@ -0,0 +1,127 @@
+"""Cost engine for CO2 usage, retail-equivalent cost and savings.
+
+Usage is loaded for a household as one DataFrame (live logs plus archived
+daily summaries, joined to their cylinder's price) and every cost is computed
+over whole columns. CO2 cost is linear in the cylinder price and retail cost
+in the retail price, so pricing scenarios reduce to a few sums taken once over
+the history and broadcast against the hypothetical prices.
+"""
+from datetime import date
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import select, union_all
+
+from app import models
+
+DEFAULT_MAX_PUSHES = 150
+DEFAULT_INITIAL_COST = 0.0
+DEFAULT_RETAIL_PRICE_PER_500ML = 45.0
+
+USAGE_COLUMNS = ["date", "volume_ml", "co2_pushes", "cylinder_cost", "max_pushes"]
+
+def _usage_select(table, household_id: int, start_date: date = None, end_date: date = None):
+    stmt = select(
+        table.date,
+        table.volume_ml,
+        table.co2_pushes,
+        models.Cylinder.cost.label("cylinder_cost"),
+        models.Cylinder.max_pushes,
+    ).outerjoin(models.Cylinder, table.cylinder_id == models.Cylinder.id).where(
+        table.household_id == household_id
+    )
+    if start_date is not None:
+        stmt = stmt.where(table.date >= start_date)
+    if end_date is not None:
+        stmt = stmt.where(table.date <= end_date)
+    return stmt
+
+def load_usage(db, household_id: int, start_date: date = None, end_date: date = None) -> pd.DataFrame:
+    """Logs and archived summaries of a household in a date range (open-ended if omitted), sorted by date"""
+    stmt = union_all(
+        _usage_select(models.ConsumptionLogArchive, household_id, start_date, end_date),
+        _usage_select(models.ConsumptionLog, household_id, start_date, end_date),
+    )
+    usage = pd.DataFrame(db.execute(stmt).all(), columns=USAGE_COLUMNS)
+
+    # Logs without a cylinder cost nothing; unknown capacity falls back to the default
+    usage["volume_ml"] = usage["volume_ml"].astype(float)
+    usage["co2_pushes"] = usage["co2_pushes"].astype(float)
+    usage["cylinder_cost"] = usage["cylinder_cost"].astype(float).fillna(0.0)
+    usage["max_pushes"] = usage["max_pushes"].astype(float).fillna(DEFAULT_MAX_PUSHES)
+    return usage.sort_values("date", kind="stable", ignore_index=True)
+
+def load_pricing(db, household_id: int):
+    """(initial_cost, retail_price_per_500ml) from a household's settings"""
+    values = dict(db.query(models.Settings.key, models.Settings.value).filter(
+        models.Settings.household_id == household_id,
+        models.Settings.key.in_(["initial_cost", "retail_price_per_500ml"])
+    ).all())
+    initial_cost = float(values["initial_cost"]) if "initial_cost" in values else DEFAULT_INITIAL_COST
+    retail_price = float(values["retail_price_per_500ml"]) if "retail_price_per_500ml" in values else DEFAULT_RETAIL_PRICE_PER_500ML
+    return initial_cost, retail_price
+
+def cylinder_share(usage: pd.DataFrame) -> np.ndarray:
+    """Fraction of a cylinder used by each row (pushes / max_pushes), 0 where capacity is unknown"""
+    max_pushes = usage["max_pushes"].to_numpy()
+    return np.divide(
+        usage["co2_pushes"].to_numpy(), max_pushes,
+        out=np.zeros(len(usage)), where=max_pushes > 0
+    )
+
+def co2_cost(usage: pd.DataFrame) -> np.ndarray:
+    """CO2 cost of each row at its cylinder's price; free cylinders cost nothing"""
+    cost = usage["cylinder_cost"].to_numpy()
+    return np.where(cost > 0, cylinder_share(usage) * cost, 0.0)
+
+def retail_cost(volume_ml, retail_price_per_500ml):
+    """Cost of buying the same volume at retail; works on scalars and arrays"""
+    return np.multiply(volume_ml, retail_price_per_500ml) / 500
+
+def cost_per_liter(total_cost, volume_ml):
+    """Cost per liter, 0 where nothing was consumed; works on scalars and arrays"""
+    liters = np.asarray(volume_ml, dtype=float) / 1000
+    return np.divide(total_cost, liters, out=np.zeros(np.broadcast(total_cost, liters).shape), where=liters > 0)
+
+def daily_costs(usage: pd.DataFrame, initial_cost: float, retail_price_per_500ml: float) -> pd.DataFrame:
+    """Per-day volume and CO2 cost with running volume, retail cost and total cost"""
+    frame = pd.DataFrame({
+        "date": usage["date"],
+        "volume_ml": usage["volume_ml"],
+        "co2_cost": co2_cost(usage),
+    })
+    daily = frame.groupby("date", sort=True).sum().reset_index()
+    daily["cumulative_volume_ml"] = daily["volume_ml"].cumsum()
+    daily["retail_cost"] = retail_cost(daily["cumulative_volume_ml"], retail_price_per_500ml)
+    daily["total_cost"] = initial_cost + daily["co2_cost"].cumsum()
+    return daily
+
+def evaluate_scenarios(usage: pd.DataFrame, initial_cost: float, retail_prices,
+                       cylinder_cost_multipliers=(), cylinder_costs=()):
+    """Total, retail-equivalent cost and savings for every cylinder price x retail price pair.
+
+    Multipliers scale each cylinder's recorded price; absolute costs replace
+    every cylinder's price. Returns a dict of 2-D arrays indexed
+    [cylinder scenario, retail price], cylinder scenarios in the order
+    multipliers then absolute costs.
+    """
+    share = cylinder_share(usage)
+    actual_cost = float(co2_cost(usage).sum())
+    cylinders_used = float(share.sum())
+    volume_ml = float(usage["volume_ml"].sum())
+
+    co2 = np.concatenate([
+        actual_cost * np.asarray(cylinder_cost_multipliers, dtype=float),
+        cylinders_used * np.asarray(cylinder_costs, dtype=float),
+    ])
+    retail = retail_cost(volume_ml, np.asarray(retail_prices, dtype=float))
+    shape = (len(co2), len(retail))
+    total = np.broadcast_to(initial_cost + co2[:, np.newaxis], shape)
+    retail = np.broadcast_to(retail[np.newaxis, :], shape)
+    return {
+        "co2_cost": np.broadcast_to(co2[:, np.newaxis], shape),
+        "total_cost": total,
+        "retail_cost": retail,
+        "savings": retail - total,
+        "cost_per_liter": cost_per_liter(total, volume_ml),
+    }
@@ -0,0 +1,437 @@
+"""Background runner for CSV, Parquet and Arrow imports.
+
+Uploads are spooled to disk by the router and then parsed and inserted here in
+a worker thread, one committed transaction per chunk, so the API stays
+responsive while a large history is loading.
+
+Jobs are claimed through their status in the database, so with several API
+processes only one runs a given job. Each process refreshes `updated_at` on
+the jobs it holds every IMPORT_HEARTBEAT_SECONDS; a queued or running job
+without a heartbeat for IMPORT_STALE_SECONDS is treated as orphaned, marked
+failed and can be resumed. The upload of a failed job is kept for
+IMPORT_SPOOL_RETENTION_HOURS so it can be resumed, then deleted.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import os
+import tempfile
+import threading
+import time
+
+import pandas as pd
+from sqlalchemy import func, or_
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from app.database import SessionLocal
+from app import models, columnar, partitioning
+from app.routers.logs import calculate_volume_and_pushes, compute_log_hash
+
+IMPORT_SPOOL_DIR = os.getenv("IMPORT_SPOOL_DIR", os.path.join(tempfile.gettempdir(), "soda_tracker_imports"))
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "5000"))
+IMPORT_WORKERS = int(os.getenv("IMPORT_WORKERS", "1"))
+IMPORT_HEARTBEAT_SECONDS = int(os.getenv("IMPORT_HEARTBEAT_SECONDS", "10"))
+IMPORT_STALE_SECONDS = int(os.getenv("IMPORT_STALE_SECONDS", "60"))
+IMPORT_SPOOL_RETENTION_HOURS = float(os.getenv("IMPORT_SPOOL_RETENTION_HOURS", "72"))
+MAX_STORED_ERRORS = 100
+
+ACTIVE_STATUSES = ("queued", "running")
+INTERRUPTED_MESSAGE = "Import was interrupted; resume it to continue"
+
+REQUIRED_COLUMNS = ['date', 'bottle_size', 'bottle_count', 'cylinder_number']
+
+_executor = ThreadPoolExecutor(max_workers=IMPORT_WORKERS, thread_name_prefix="import")
+_active_jobs = set()
+_active_lock = threading.Lock()
+_heartbeat = None
+_stopping = threading.Event()
+
+def spool_path(job_id: str, extension: str = ".csv") -> str:
+    """Location on disk of the uploaded file for a job"""
+    os.makedirs(IMPORT_SPOOL_DIR, exist_ok=True)
+    return os.path.join(IMPORT_SPOOL_DIR, f"{job_id}{extension}")
+
+def read_columns(path: str):
+    """Column names of a spooled file, read from its header or schema only"""
+    fmt = columnar.format_for_filename(path)
+    if fmt:
+        return columnar.read_columns(path, fmt)
+    return pd.read_csv(path, nrows=0).columns
+
+def _orphaned():
+    """Filter for queued or running jobs whose holder stopped sending heartbeats"""
+    cutoff = datetime.utcnow() - timedelta(seconds=IMPORT_STALE_SECONDS)
+    return models.ImportJob.status.in_(ACTIVE_STATUSES) & (models.ImportJob.updated_at < cutoff)
+
+def claim_for_resume(db, job_id: str, household_id: int) -> bool:
+    """Move a failed or orphaned job back to queued.
+
+    Returns False if the job completed or another process still holds it.
+    """
+    claimed = db.query(models.ImportJob).filter(
+        models.ImportJob.id == job_id,
+        models.ImportJob.household_id == household_id,
+        or_(models.ImportJob.status == "failed", _orphaned())
+    ).update({
+        "status": "queued",
+        "error_message": None,
+        "updated_at": datetime.utcnow()
+    }, synchronize_session=False)
+    db.commit()
+    return claimed == 1
+
+def expire_orphaned(db, job_id: str = None, household_id: int = None) -> int:
+    """Mark orphaned jobs (or just job_id / a household's jobs, if given) failed so they can be resumed"""
+    query = db.query(models.ImportJob).filter(_orphaned())
+    if job_id is not None:
+        query = query.filter(models.ImportJob.id == job_id)
+    if household_id is not None:
+        query = query.filter(models.ImportJob.household_id == household_id)
+    expired = query.update({
+        "status": "failed",
+        "error_message": INTERRUPTED_MESSAGE,
+        "updated_at": datetime.utcnow()
+    }, synchronize_session=False)
+    db.commit()
+    return expired
+
+def purge_expired_uploads(db) -> int:
+    """Delete the spooled uploads of jobs that failed more than IMPORT_SPOOL_RETENTION_HOURS ago"""
+    cutoff = datetime.utcnow() - timedelta(hours=IMPORT_SPOOL_RETENTION_HOURS)
+    jobs = db.query(models.ImportJob).filter(
+        models.ImportJob.status == "failed",
+        models.ImportJob.file_path.is_not(None),
+        models.ImportJob.updated_at < cutoff
+    ).all()
+    for job in jobs:
+        try:
+            os.remove(job.file_path)
+        except OSError:
+            pass
+        # The job can no longer be resumed
+        job.file_path = None
+    db.commit()
+    return len(jobs)
+
+def _send_heartbeats():
+    """Refresh updated_at of the jobs this process holds, so others don't take them over"""
+    while True:
+        time.sleep(IMPORT_HEARTBEAT_SECONDS)
+        with _active_lock:
+            job_ids = list(_active_jobs)
+        if not job_ids:
+            continue
+        db = SessionLocal()
+        try:
+            db.query(models.ImportJob).filter(
+                models.ImportJob.id.in_(job_ids),
+                models.ImportJob.status.in_(ACTIVE_STATUSES)
+            ).update({"updated_at": datetime.utcnow()}, synchronize_session=False)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            print(f"Import heartbeat failed: {e}")
+        finally:
+            db.close()
+
+def submit(job_id: str) -> bool:
+    """Queue a job on the worker pool. Returns False if it is already queued or running here."""
+    global _heartbeat
+    with _active_lock:
+        if job_id in _active_jobs:
+            return False
+        _active_jobs.add(job_id)
+        # Started lazily so it runs in the serving process, not a pre-fork parent
+        if _heartbeat is None:
+            _heartbeat = threading.Thread(target=_send_heartbeats, name="import-heartbeat", daemon=True)
+            _heartbeat.start()
+    _executor.submit(_run, job_id)
+    return True
+
+def shutdown():
+    """Stop the worker pool without waiting and mark the jobs it held failed.
+
+    Running jobs stop after their current chunk; all of them can be resumed
+    from the last committed chunk.
+    """
+    _stopping.set()
+    _executor.shutdown(wait=False, cancel_futures=True)
+    with _active_lock:
+        job_ids = list(_active_jobs)
+    if not job_ids:
+        return
+    db = SessionLocal()
+    try:
+        db.query(models.ImportJob).filter(
+            models.ImportJob.id.in_(job_ids),
+            models.ImportJob.status.in_(ACTIVE_STATUSES)
+        ).update({
+            "status": "failed",
+            "error_message": INTERRUPTED_MESSAGE,
+            "updated_at": datetime.utcnow()
+        }, synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+def _count_rows(path: str) -> int:
+    """Number of data rows; for CSV estimated from the line count (header excluded)"""
+    fmt = columnar.format_for_filename(path)
+    if fmt:
+        return columnar.count_rows(path, fmt)
+
+    lines = 0
+    last = b""
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            lines += block.count(b"\n")
+            last = block
+    if last and not last.endswith(b"\n"):
+        lines += 1
+    return max(lines - 1, 0)
+
+def _read_chunks(path: str, skip: int = 0):
+    """Yield DataFrames of IMPORT_CHUNK_SIZE rows from a CSV, Parquet or Arrow file,
+    starting after the first `skip` data rows"""
+    fmt = columnar.format_for_filename(path)
+    if fmt:
+        yield from columnar.read_batches(path, fmt, skip, IMPORT_CHUNK_SIZE)
+        return
+
+    reader = pd.read_csv(
+        path,
+        chunksize=IMPORT_CHUNK_SIZE,
+        skiprows=range(1, skip + 1) if skip else None
+    )
+    with reader:
+        yield from reader
+
+def _natural_key(row):
+    """Normalized identifying fields of a CSV row: (date, bottle_size, bottle_count, cylinder_number)"""
+    return (
+        pd.to_datetime(row['date']).date(),
+        row['bottle_size'],
+        int(row['bottle_count']),
+        int(row['cylinder_number'])
+    )
+
+def _count_occurrences(path: str, nrows: int, occurrences: dict):
+    """Rebuild per-key occurrence counts for rows already imported by a previous run"""
+    # Closed explicitly since iteration stops early; this releases the file
+    chunks = _read_chunks(path)
+    try:
+        for chunk in chunks:
+            for index, row in chunk.iterrows():
+                if index >= nrows:
+                    return
+                try:
+                    _row_hash(row, _natural_key(row), occurrences)
+                except Exception:
+                    continue
+    finally:
+        chunks.close()
+
+def _row_hash(row, key, occurrences: dict):
+    """Hash from the CSV if it came from an export, else from the row content"""
+    if 'row_hash' in row and pd.notna(row['row_hash']):
+        return str(row['row_hash'])
+
+    if 'created_at' in row and pd.notna(row['created_at']):
+        discriminator = pd.to_datetime(row['created_at']).to_pydatetime().isoformat()
+    else:
+        # Identical rows in one file are told apart by their occurrence number
+        occurrences[key] = occurrences.get(key, 0) + 1
+        discriminator = f"#{occurrences[key]}"
+
+    return compute_log_hash(*key, discriminator)
+
+def _upsert_logs(db, household_id: int, rows: list, conflict_mode: str):
+    """Insert logs in bulk, skipping or updating those whose row_hash already exists.
+    
+    Rows flagged `_pushes_supplied` carried their own co2_pushes; only those
+    overwrite the pushes of an existing log on update.
+    
+    Returns (inserted, updated, skipped).
+    """
+    # Collapse duplicates within the batch; a single statement cannot touch a row twice
+    unique_rows = {}
+    for row in rows:
+        unique_rows.setdefault(row['row_hash'], row)
+    duplicates = len(rows) - len(unique_rows)
+    rows = list(unique_rows.values())
+    if not rows:
+        return 0, 0, duplicates
+
+    table = models.ConsumptionLog.__table__
+    existing = db.query(func.count(table.c.id)).filter(
+        table.c.household_id == household_id,
+        table.c.row_hash.in_(list(unique_rows.keys()))
+    ).scalar()
+
+    # A partitioned table's unique index also covers the partition key
+    conn = db.connection()
+    conflict_target = [table.c.household_id, table.c.row_hash]
+    if partitioning.is_partitioned(conn):
+        conflict_target.append(table.c.date)
+
+    groups = {True: [], False: []}
+    for row in rows:
+        groups[row.pop("_pushes_supplied", False)].append(row)
+
+    insert = sqlite_insert if conn.dialect.name == "sqlite" else postgresql_insert
+    stmt = insert(table)
+    if conflict_mode == "update":
+        for pushes_supplied, group in groups.items():
+            if not group:
+                continue
+            columns = ["date", "bottle_size", "bottle_count", "volume_ml", "cylinder_id"]
+            if pushes_supplied:
+                columns.append("co2_pushes")
+            db.execute(stmt.on_conflict_do_update(
+                index_elements=conflict_target,
+                set_={col: stmt.excluded[col] for col in columns}
+            ), group)
+        return len(rows) - existing, existing, duplicates
+
+    db.execute(stmt.on_conflict_do_nothing(index_elements=conflict_target), rows)
+    return len(rows) - existing, 0, existing + duplicates
+
+def _import_chunk(db, job, chunk: pd.DataFrame, row_offset: int,
+                  archived_through, cylinder_ids: dict, occurrences: dict, errors: list):
+    """Upsert the rows of one chunk. Returns (inserted, updated, skipped, error_count)."""
+    rows = []
+    archived = 0
+    error_count = 0
+
+    for index, row in chunk.iterrows():
+        try:
+            key = _natural_key(row)
+            log_date, bottle_size, bottle_count, number = key
+            row_hash = _row_hash(row, key, occurrences)
+
+            # Days already summarized into the archive are not re-imported
+            if archived_through and log_date <= archived_through:
+                archived += 1
+                continue
+
+            # Find or create cylinder, remembering ids for the rest of the file
+            if number not in cylinder_ids:
+                cylinder = db.query(models.Cylinder).filter(
+                    models.Cylinder.household_id == job.household_id,
+                    models.Cylinder.number == number
+                ).first()
+
+                if not cylinder:
+                    # Create new cylinder if it doesn't exist, priced as in the export it came from
+                    cylinder = models.Cylinder(household_id=job.household_id, number=number, cost=0.0)
+                    if 'cylinder_cost' in row and pd.notna(row['cylinder_cost']):
+                        cylinder.cost = float(row['cylinder_cost'])
+                    if 'cylinder_max_pushes' in row and pd.notna(row['cylinder_max_pushes']):
+                        cylinder.max_pushes = int(row['cylinder_max_pushes'])
+                    db.add(cylinder)
+                    db.flush()  # Get the ID
+
+                cylinder_ids[number] = cylinder.id
+
+            # Calculate volume; pushes from the file override the default, as for manual logs
+            volume_ml, co2_pushes = calculate_volume_and_pushes(bottle_size, bottle_count)
+            pushes_supplied = 'co2_pushes' in row and pd.notna(row['co2_pushes'])
+            if pushes_supplied:
+                co2_pushes = int(row['co2_pushes'])
+
+            created_at = datetime.utcnow()
+            if 'created_at' in row and pd.notna(row['created_at']):
+                created_at = pd.to_datetime(row['created_at']).to_pydatetime()
+
+            rows.append({
+                "household_id": job.household_id,
+                "date": log_date,
+                "bottle_size": bottle_size,
+                "bottle_count": bottle_count,
+                "volume_ml": volume_ml,
+                "co2_pushes": co2_pushes,
+                "cylinder_id": cylinder_ids[number],
+                "created_at": created_at,
+                "row_hash": row_hash,
+                "_pushes_supplied": pushes_supplied
+            })
+
+        except Exception as e:
+            error_count += 1
+            if len(errors) < MAX_STORED_ERRORS:
+                errors.append(f"Row {row_offset + index + 1}: {str(e)}")
+
+    inserted, updated, skipped = _upsert_logs(db, job.household_id, rows, job.conflict_mode)
+    return inserted, updated, skipped + archived, error_count
+
+def _run(job_id: str):
+    db = SessionLocal()
+    try:
+        # Only one process may run a job; it is claimed by moving it out of queued
+        claimed = db.query(models.ImportJob).filter(
+            models.ImportJob.id == job_id,
+            models.ImportJob.status == "queued"
+        ).update({"status": "running", "updated_at": datetime.utcnow()}, synchronize_session=False)
+        db.commit()
+        if not claimed:
+            return
+
+        job = db.query(models.ImportJob).filter(models.ImportJob.id == job_id).first()
+        if job.total_rows is None:
+            job.total_rows = _count_rows(job.file_path)
+        db.commit()
+
+        # Skip rows already committed by a previous (failed) run
+        start = job.processed_rows or 0
+
+        cylinder_ids = {}
+        occurrences = {}
+        errors = list(job.errors or [])
+        archived_through = db.query(func.max(models.ConsumptionLogArchive.date)).filter(
+            models.ConsumptionLogArchive.household_id == job.household_id
+        ).scalar()
+        if start:
+            _count_occurrences(job.file_path, start, occurrences)
+
+        for chunk in _read_chunks(job.file_path, start):
+            inserted, updated, skipped, failed = _import_chunk(
+                db, job, chunk, start, archived_through, cylinder_ids, occurrences, errors
+            )
+
+            # Progress is committed in the same transaction as the rows
+            job.processed_rows += len(chunk)
+            job.imported_count += inserted
+            job.updated_count += updated
+            job.skipped_count += skipped
+            job.error_count += failed
+            job.errors = list(errors)
+            job.updated_at = datetime.utcnow()
+            db.commit()
+
+            if _stopping.is_set():
+                job.status = "failed"
+                job.error_message = INTERRUPTED_MESSAGE
+                db.commit()
+                return
+
+        job.status = "completed"
+        job.updated_at = datetime.utcnow()
+        db.commit()
+
+        try:
+            os.remove(job.file_path)
+        except OSError:
+            pass
+
+    except Exception as e:
+        db.rollback()
+        job = db.query(models.ImportJob).filter(models.ImportJob.id == job_id).first()
+        if job:
+            job.status = "failed"
+            job.error_message = str(e)
+            job.updated_at = datetime.utcnow()
+            db.commit()
+    finally:
+        db.close()
+        with _active_lock:
+            _active_jobs.discard(job_id)
@@ -1,36 +1,186 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from app.database import engine
+from fastapi.responses import JSONResponse
+from app.database import engine, read_engine, SessionLocal, READ_PRIMARY_COOKIE, READ_YOUR_WRITES_SECONDS
 from app.models import Base
+from app import models, partitioning, import_jobs
 from app.routers import logs, cylinders, analytics, settings, data
-from sqlalchemy import text
+from app.routers.logs import compute_log_hash
+from sqlalchemy import text, select, update, bindparam, inspect
+import asyncio
+import os
+import time
 
 # Create database tables
 Base.metadata.create_all(bind=engine)
 
 # Run migrations for existing databases
+MIGRATION_COLUMNS = [
+    ("cylinders", "max_pushes", "INTEGER DEFAULT 150"),
+    ("consumption_logs", "row_hash", "VARCHAR"),
+    ("import_jobs", "conflict_mode", "VARCHAR DEFAULT 'skip'"),
+    ("import_jobs", "updated_count", "INTEGER DEFAULT 0"),
+    ("import_jobs", "skipped_count", "INTEGER DEFAULT 0"),
+    ("cylinders", "household_id", "INTEGER NOT NULL DEFAULT 1"),
+    ("consumption_logs", "household_id", "INTEGER NOT NULL DEFAULT 1"),
+    ("consumption_log_archive", "household_id", "INTEGER NOT NULL DEFAULT 1"),
+    ("settings", "household_id", "INTEGER NOT NULL DEFAULT 1"),
+    ("import_jobs", "household_id", "INTEGER NOT NULL DEFAULT 1"),
+]
+
+# Global indexes replaced by per-household ones that lead with household_id
+LEGACY_INDEXES = [
+    "ix_cylinders_number",
+    "ix_settings_key",
+    "ix_consumption_logs_date",
+    "ix_consumption_logs_row_hash",
+    "ix_consumption_log_archive_date",
+]
+TENANT_INDEXES = [
+    ("ix_cylinders_household_number", "cylinders", "household_id, number", True),
+    ("ix_settings_household_key", "settings", "household_id, key", True),
+    ("ix_consumption_logs_household_date", "consumption_logs", "household_id, date", False),
+    ("ix_consumption_logs_household_cylinder", "consumption_logs", "household_id, cylinder_id", False),
+    ("ix_consumption_logs_household_row_hash", "consumption_logs", "household_id, row_hash", True),
+    ("ix_consumption_log_archive_household_date", "consumption_log_archive", "household_id, date", False),
+    ("ix_import_jobs_household_id", "import_jobs", "household_id", False),
+]
+
+def backfill_log_hashes(conn):
+    """Compute content hashes for logs created before row_hash existed.
+
+    Logs are told apart by created_at like new ones; a log without one, or
+    sharing it with an identical log, is keyed by its id instead so the
+    unique (household_id, row_hash) index can't reject the update.
+    """
+    log = models.ConsumptionLog.__table__
+    rows = conn.execute(
+        select(log.c.id, log.c.household_id, log.c.date, log.c.bottle_size, log.c.bottle_count,
+               log.c.created_at, models.Cylinder.number)
+        .join(models.Cylinder.__table__, models.Cylinder.id == log.c.cylinder_id)
+        .where(log.c.row_hash.is_(None))
+        .order_by(log.c.id)
+    ).fetchall()
+    if not rows:
+        return
+
+    used = {
+        (row.household_id, row.row_hash)
+        for row in conn.execute(select(log.c.household_id, log.c.row_hash).where(log.c.row_hash.is_not(None)))
+    }
+    updates = []
+    for row in rows:
+        key = (row.date, row.bottle_size, row.bottle_count, row.number)
+        row_hash = None
+        if row.created_at is not None:
+            row_hash = compute_log_hash(*key, row.created_at.isoformat())
+        if row_hash is None or (row.household_id, row_hash) in used:
+            row_hash = compute_log_hash(*key, f"id:{row.id}")
+        used.add((row.household_id, row_hash))
+        updates.append({"log_id": row.id, "hash": row_hash})
+
+    conn.execute(
+        update(log).where(log.c.id == bindparam("log_id")).values(row_hash=bindparam("hash")),
+        updates
+    )
+    conn.commit()
+    print(f"Migration: Backfilled row_hash for {len(rows)} consumption logs")
+
 def run_migrations():
     """Run necessary migrations for existing databases"""
     try:
         with engine.connect() as conn:
-            # Check if max_pushes column exists
-            result = conn.execute(text("""
-                SELECT column_name 
-                FROM information_schema.columns 
-                WHERE table_name='cylinders' AND column_name='max_pushes'
-            """))
-            if not result.fetchone():
-                # Add max_pushes column if it doesn't exist
-                conn.execute(text("ALTER TABLE cylinders ADD COLUMN max_pushes INTEGER DEFAULT 150"))
-                conn.commit()
-                print("Migration: Added max_pushes column to cylinders table")
+            for table, column, ddl in MIGRATION_COLUMNS:
+                # Check if the column exists
+                columns = [c["name"] for c in inspect(conn).get_columns(table)]
+                if column not in columns:
+                    # Add the column if it doesn't exist
+                    conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+                    conn.commit()
+                    print(f"Migration: Added {column} column to {table} table")
+            
+            # Unique indexes on a partitioned table must include its partition key
+            partitioned = partitioning.is_partitioned(conn)
+            for name in LEGACY_INDEXES:
+                conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+            for name, table, columns, unique in TENANT_INDEXES:
+                if unique and partitioned and table == "consumption_logs":
+                    columns += ", date"
+                conn.execute(text(
+                    f"CREATE {'UNIQUE ' if unique else ''}INDEX IF NOT EXISTS {name} ON {table} ({columns})"
+                ))
+            conn.commit()
     except Exception as e:
         print(f"Migration warning: {e}")
+    
+    # Each remaining step runs on its own so one failure doesn't block the others
+    try:
+        with engine.connect() as conn:
+            backfill_log_hashes(conn)
+    except Exception as e:
+        print(f"Migration warning: row_hash backfill failed: {e}")
+    
+    try:
+        # Monthly partitions and cold archive, when enabled
+        partitioning.maintain(engine)
+    except Exception as e:
+        print(f"Migration warning: partition maintenance failed: {e}")
 
 run_migrations()
 
+# Imports left queued or running by a stopped process become resumable
+try:
+    with SessionLocal() as db:
+        expired = import_jobs.expire_orphaned(db)
+        purged = import_jobs.purge_expired_uploads(db)
+    if expired:
+        print(f"Marked {expired} interrupted import jobs as failed")
+    if purged:
+        print(f"Deleted the uploads of {purged} expired import jobs")
+except Exception as e:
+    print(f"Migration warning: could not expire interrupted imports: {e}")
+
 app = FastAPI(title="SodaStream Tracker API", version="1.0.0")
 
+# Bounded concurrency per worker: requests wait briefly for a slot, then get a
+# 503 so load balancers and clients back off instead of piling up. Registered
+# before CORS so the rejection still carries CORS headers.
+MAX_CONCURRENT_REQUESTS = int(os.getenv("MAX_CONCURRENT_REQUESTS", "40"))
+REQUEST_QUEUE_TIMEOUT = float(os.getenv("REQUEST_QUEUE_TIMEOUT", "1.0"))
+PROBE_PATHS = {"/healthz", "/readyz"}
+request_slots = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+
+class ConcurrencyLimitMiddleware:
+    """Bound the requests a worker handles at once.
+
+    A plain ASGI middleware, so the slot is held until the whole response
+    body has been sent, streamed exports included.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in PROBE_PATHS:
+            await self.app(scope, receive, send)
+            return
+        try:
+            await asyncio.wait_for(request_slots.acquire(), REQUEST_QUEUE_TIMEOUT)
+        except asyncio.TimeoutError:
+            response = JSONResponse(
+                {"detail": "Server busy, please retry"},
+                status_code=503,
+                headers={"Retry-After": "1"}
+            )
+            await response(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            request_slots.release()
+
+app.add_middleware(ConcurrencyLimitMiddleware)
+
 # CORS middleware - Allow access from any origin on port 3003
 app.add_middleware(
     CORSMiddleware,
@@ -40,6 +190,21 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Read-your-writes: after a successful mutation, pin the client's reads to the
+# primary until the replica has had time to catch up
+@app.middleware("http")
+async def pin_reads_after_write(request: Request, call_next):
+    response = await call_next(request)
+    if read_engine is not engine and request.method not in ("GET", "HEAD", "OPTIONS") and response.status_code < 400:
+        response.set_cookie(
+            READ_PRIMARY_COOKIE,
+            str(time.time() + READ_YOUR_WRITES_SECONDS),
+            max_age=READ_YOUR_WRITES_SECONDS,
+            httponly=True,
+            samesite="lax"
+        )
+    return response
+
 # Include routers
 app.include_router(logs.router, prefix="/api/logs", tags=["logs"])
 app.include_router(cylinders.router, prefix="/api/cylinders", tags=["cylinders"])
@@ -49,4 +214,39 @@ app.include_router(data.router, prefix="/api/data", tags=["data"])
 
 @app.get("/")
 async def root():
-    return {"message": "SodaStream Tracker API"}
\ No newline at end of file
+    return {"message": "SodaStream Tracker API"}
+
+@app.get("/healthz")
+async def healthz():
+    """Liveness probe: the worker is up and serving requests"""
+    return {"status": "ok"}
+
+@app.get("/readyz")
+def readyz():
+    """Readiness probe: each database pool can hand out a working connection"""
+    engines = {"database": engine}
+    if read_engine is not engine:
+        engines["read_database"] = read_engine
+    
+    checks = {}
+    ready = True
+    for name, db_engine in engines.items():
+        try:
+            with db_engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+            checks[name] = {"status": "ok", "pool": db_engine.pool.status()}
+        except Exception as e:
+            ready = False
+            checks[name] = {"status": "error", "detail": str(e)}
+    
+    return JSONResponse(
+        {"status": "ready" if ready else "unavailable", "checks": checks},
+        status_code=200 if ready else 503
+    )
+
+@app.on_event("shutdown")
+def shutdown():
+    # Stop imports after their current chunk; they are marked failed and can be resumed
+    import_jobs.shutdown()
+    engine.dispose()
+    read_engine.dispose()
\ No newline at end of file
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, Date, DateTime, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, ForeignKey, Boolean, JSON, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -9,32 +9,91 @@ class Cylinder(Base):
     __tablename__ = "cylinders"
     
     id = Column(Integer, primary_key=True, index=True)
-    number = Column(Integer, unique=True, index=True)
+    household_id = Column(Integer, nullable=False, default=1)
+    number = Column(Integer)  # unique within a household
     cost = Column(Float, default=0.0)
     max_pushes = Column(Integer, default=150)  # Maximum number of pushes per cylinder
     is_active = Column(Boolean, default=False)
     created_at = Column(DateTime, default=datetime.utcnow)
     
     consumption_logs = relationship("ConsumptionLog", back_populates="cylinder")
+    
+    __table_args__ = (
+        Index("ix_cylinders_household_number", "household_id", "number", unique=True),
+    )
 
 class ConsumptionLog(Base):
     __tablename__ = "consumption_logs"
     
     id = Column(Integer, primary_key=True, index=True)
-    date = Column(Date, index=True)
+    household_id = Column(Integer, nullable=False, default=1)
+    date = Column(Date)
     bottle_size = Column(String)  # "1L" or "0.5L"
     bottle_count = Column(Integer)
     volume_ml = Column(Float)  # calculated volume in mL
     co2_pushes = Column(Integer)  # number of CO2 button pushes
     cylinder_id = Column(Integer, ForeignKey("cylinders.id"))
     created_at = Column(DateTime, default=datetime.utcnow)
+    row_hash = Column(String, nullable=True)  # content hash identifying the log across imports
     
     cylinder = relationship("Cylinder", back_populates="consumption_logs")
+    
+    __table_args__ = (
+        Index("ix_consumption_logs_household_date", "household_id", "date"),
+        Index("ix_consumption_logs_household_cylinder", "household_id", "cylinder_id"),
+        Index("ix_consumption_logs_household_row_hash", "household_id", "row_hash", unique=True),
+    )
+
+# Daily per-cylinder summaries of consumption logs moved out of the hot table
+class ConsumptionLogArchive(Base):
+    __tablename__ = "consumption_log_archive"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    household_id = Column(Integer, nullable=False, default=1)
+    date = Column(Date)
+    bottle_size = Column(String)
+    log_count = Column(Integer)  # number of logs summarized by this row
+    bottle_count = Column(Integer)
+    volume_ml = Column(Float)
+    co2_pushes = Column(Integer)
+    cylinder_id = Column(Integer, ForeignKey("cylinders.id"))
+    archived_at = Column(DateTime, default=datetime.utcnow)
+    
+    cylinder = relationship("Cylinder")
+    
+    __table_args__ = (
+        Index("ix_consumption_log_archive_household_date", "household_id", "date"),
+    )
 
 class Settings(Base):
     __tablename__ = "settings"
     
     id = Column(Integer, primary_key=True, index=True)
-    key = Column(String, unique=True, index=True)
+    household_id = Column(Integer, nullable=False, default=1)
+    key = Column(String)  # unique within a household
     value = Column(String)
-    updated_at = Column(DateTime, default=datetime.utcnow)
\ No newline at end of file
+    updated_at = Column(DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        Index("ix_settings_household_key", "household_id", "key", unique=True),
+    )
+
+class ImportJob(Base):
+    __tablename__ = "import_jobs"
+    
+    id = Column(String, primary_key=True, index=True)  # uuid hex
+    household_id = Column(Integer, nullable=False, default=1, index=True)
+    filename = Column(String)
+    file_path = Column(String)  # spooled upload on local disk
+    status = Column(String, default="queued", index=True)  # "queued", "running", "completed" or "failed"
+    total_rows = Column(Integer, nullable=True)  # estimated from line count
+    processed_rows = Column(Integer, default=0)  # rows committed so far, used as the resume offset
+    conflict_mode = Column(String, default="skip")  # "skip" or "update" rows whose hash already exists
+    imported_count = Column(Integer, default=0)  # rows inserted
+    updated_count = Column(Integer, default=0)
+    skipped_count = Column(Integer, default=0)
+    error_count = Column(Integer, default=0)
+    errors = Column(JSON, default=list)  # first row errors, capped
+    error_message = Column(String, nullable=True)  # fatal error that stopped the job
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow)
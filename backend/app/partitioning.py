@@ -0,0 +1,157 @@
+"""Monthly range partitioning and cold archiving of consumption_logs.
+
+With PARTITION_CONSUMPTION_LOGS enabled on PostgreSQL, consumption_logs is
+converted to a table partitioned by month on `date`, and a partition for each
+month with data (plus MONTHS_AHEAD future months) is created and attached on
+startup. Rows outside the created months land in a default partition and are
+moved into their own partition on the next run.
+
+With ARCHIVE_AFTER_YEARS set, logs older than that many years are summarized
+per day, cylinder and bottle size into consumption_log_archive and removed
+from the hot table; analytics reads the archive alongside the live logs.
+
+Run `python -m app.partitioning` to apply both outside of startup (e.g. cron);
+it also deletes expired import uploads.
+"""
+from datetime import date
+import os
+
+from sqlalchemy import text
+
+PARTITION_CONSUMPTION_LOGS = os.getenv("PARTITION_CONSUMPTION_LOGS", "false").lower() in ("1", "true", "yes")
+ARCHIVE_AFTER_YEARS = int(os.getenv("ARCHIVE_AFTER_YEARS", "0"))
+MONTHS_AHEAD = 3
+
+TABLE = "consumption_logs"
+DEFAULT_PARTITION = f"{TABLE}_default"
+
+def _add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+def _partition_name(month: date) -> str:
+    return f"{TABLE}_p{month.year:04d}_{month.month:02d}"
+
+def is_partitioned(conn) -> bool:
+    if conn.dialect.name != "postgresql":
+        return False
+    return conn.execute(text(
+        "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:table)"
+    ), {"table": TABLE}).first() is not None
+
+def _existing_partitions(conn) -> set:
+    rows = conn.execute(text("""
+        SELECT c.relname
+        FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = to_regclass(:table)
+    """), {"table": TABLE})
+    return {row.relname for row in rows}
+
+def ensure_partitions(conn, first_month: date = None):
+    """Create and attach monthly partitions from first_month (or the oldest log) through MONTHS_AHEAD"""
+    if first_month is None:
+        oldest = conn.execute(text(f"SELECT min(date) FROM {TABLE}")).scalar()
+        first_month = (oldest or date.today()).replace(day=1)
+
+    existing = _existing_partitions(conn)
+    last_month = _add_months(date.today().replace(day=1), MONTHS_AHEAD)
+    attached = 0
+    month = first_month
+    while month <= last_month:
+        name = _partition_name(month)
+        if name not in existing:
+            upper = _add_months(month, 1)
+            # Build the partition detached, pull in any of its rows from the
+            # default partition, then attach it
+            conn.execute(text(f"CREATE TABLE {name} (LIKE {TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+            conn.execute(text(f"""
+                WITH moved AS (
+                    DELETE FROM {DEFAULT_PARTITION} WHERE date >= :lower AND date < :upper RETURNING *
+                )
+                INSERT INTO {name} SELECT * FROM moved
+            """), {"lower": month, "upper": upper})
+            conn.execute(text(
+                f"ALTER TABLE {TABLE} ATTACH PARTITION {name} FOR VALUES FROM ('{month}') TO ('{upper}')"
+            ))
+            attached += 1
+        month = _add_months(month, 1)
+
+    if attached:
+        print(f"Migration: Attached {attached} monthly partitions to {TABLE}")
+
+def convert_to_partitioned(conn):
+    """Rebuild a plain consumption_logs table as a table partitioned by month on date"""
+    legacy = f"{TABLE}_legacy"
+    oldest = conn.execute(text(f"SELECT min(date) FROM {TABLE}")).scalar()
+
+    # Free up index and constraint names for the new table
+    conn.execute(text(f"ALTER TABLE {TABLE} RENAME TO {legacy}"))
+    conn.execute(text(f"ALTER TABLE {legacy} RENAME CONSTRAINT {TABLE}_pkey TO {legacy}_pkey"))
+    conn.execute(text(f"ALTER TABLE {legacy} DROP CONSTRAINT IF EXISTS {TABLE}_cylinder_id_fkey"))
+    indexes = conn.execute(text(
+        "SELECT indexname FROM pg_indexes WHERE tablename = :table AND indexname != :pkey"
+    ), {"table": legacy, "pkey": f"{legacy}_pkey"})
+    for row in indexes.fetchall():
+        conn.execute(text(f"DROP INDEX {row.indexname}"))
+
+    # Unique keys on a partitioned table must include the partition key
+    conn.execute(text(f"CREATE TABLE {TABLE} (LIKE {legacy} INCLUDING DEFAULTS) PARTITION BY RANGE (date)"))
+    conn.execute(text(f"ALTER TABLE {TABLE} ADD PRIMARY KEY (id, date)"))
+    conn.execute(text(f"ALTER TABLE {TABLE} ADD CONSTRAINT {TABLE}_cylinder_id_fkey FOREIGN KEY (cylinder_id) REFERENCES cylinders (id)"))
+    conn.execute(text(f"CREATE INDEX ix_{TABLE}_id ON {TABLE} (id)"))
+    conn.execute(text(f"CREATE INDEX ix_{TABLE}_household_date ON {TABLE} (household_id, date)"))
+    conn.execute(text(f"CREATE INDEX ix_{TABLE}_household_cylinder ON {TABLE} (household_id, cylinder_id)"))
+    conn.execute(text(f"CREATE UNIQUE INDEX ix_{TABLE}_household_row_hash ON {TABLE} (household_id, row_hash, date)"))
+    conn.execute(text(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF {TABLE} DEFAULT"))
+    conn.execute(text(f"ALTER SEQUENCE {TABLE}_id_seq OWNED BY {TABLE}.id"))
+
+    ensure_partitions(conn, (oldest or date.today()).replace(day=1))
+    conn.execute(text(f"INSERT INTO {TABLE} SELECT * FROM {legacy}"))
+    conn.execute(text(f"DROP TABLE {legacy}"))
+    print("Migration: Converted consumption_logs to a partitioned table")
+
+def archive_old_logs(conn, years: int):
+    """Summarize logs older than `years` (from the start of this month) into the archive and drop them"""
+    cutoff = date.today().replace(day=1)
+    cutoff = cutoff.replace(year=cutoff.year - years)
+
+    archived = conn.execute(text(f"""
+        INSERT INTO consumption_log_archive
+            (household_id, date, cylinder_id, bottle_size, log_count, bottle_count, volume_ml, co2_pushes, archived_at)
+        SELECT household_id, date, cylinder_id, bottle_size, count(*), sum(bottle_count), sum(volume_ml), sum(co2_pushes), CURRENT_TIMESTAMP
+        FROM {TABLE}
+        WHERE date < :cutoff
+        GROUP BY household_id, date, cylinder_id, bottle_size
+    """), {"cutoff": cutoff}).rowcount
+    if not archived:
+        return
+
+    # Whole partitions are dropped; anything left (default partition or a
+    # plain table) is deleted row by row
+    if is_partitioned(conn):
+        for name in sorted(_existing_partitions(conn)):
+            if name == DEFAULT_PARTITION:
+                continue
+            year, month = name[len(TABLE) + 2:].split("_")
+            if _add_months(date(int(year), int(month), 1), 1) <= cutoff:
+                conn.execute(text(f"DROP TABLE {name}"))
+    conn.execute(text(f"DELETE FROM {TABLE} WHERE date < :cutoff"), {"cutoff": cutoff})
+    print(f"Migration: Archived consumption logs before {cutoff} into {archived} summary rows")
+
+def maintain(engine):
+    """Apply the partitioning and archive policies configured by environment"""
+    with engine.begin() as conn:
+        if PARTITION_CONSUMPTION_LOGS and conn.dialect.name == "postgresql":
+            if is_partitioned(conn):
+                ensure_partitions(conn)
+            else:
+                convert_to_partitioned(conn)
+        if ARCHIVE_AFTER_YEARS > 0:
+            archive_old_logs(conn, ARCHIVE_AFTER_YEARS)
+
+if __name__ == "__main__":
+    from app.database import engine, SessionLocal
+    from app import import_jobs
+    maintain(engine)
+    with SessionLocal() as db:
+        import_jobs.purge_expired_uploads(db)
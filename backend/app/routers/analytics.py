@@ -1,105 +1,48 @@
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-from app.database import get_db
-from app import models, schemas
-from datetime import datetime, date, timedelta
-from typing import Optional
+from app.database import get_read_db, get_household_id
+from app import models, schemas, costs
+from datetime import date, timedelta
+from typing import List, Optional
 
 router = APIRouter()
 
+MAX_SCENARIOS = 1000
+
 @router.get("/", response_model=schemas.AnalyticsResponse)
 def get_analytics(
     period: str = Query("30d", regex="^(30d|90d|180d|365d)$"),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db),
+    household_id: int = Depends(get_household_id)
 ):
     # Calculate date range based on period
     period_days = int(period.replace('d', ''))
     end_date = date.today()
     start_date = end_date - timedelta(days=period_days)
     
-    # Get consumption logs within the period
-    logs = db.query(models.ConsumptionLog).filter(
-        models.ConsumptionLog.date >= start_date,
-        models.ConsumptionLog.date <= end_date
-    ).all()
+    # Logs and archived summaries within the period, with their cylinder prices
+    usage = costs.load_usage(db, household_id, start_date, end_date)
+    initial_cost, retail_price_per_500ml = costs.load_pricing(db, household_id)
+    
+    # Per-day volume and cost, with running totals for the charts
+    daily = costs.daily_costs(usage, initial_cost, retail_price_per_500ml)
     
     # Calculate totals
-    total_consumption_ml = sum(log.volume_ml for log in logs)
+    total_consumption_ml = float(daily["volume_ml"].sum())
     
     # Calculate average based on actual data days, not selected period days
-    unique_dates = set(log.date for log in logs)
-    actual_data_days = len(unique_dates)
+    actual_data_days = len(daily)
     average_daily_consumption_ml = total_consumption_ml / actual_data_days if actual_data_days > 0 else 0
     
-    # Get initial cost from settings
-    initial_cost_setting = db.query(models.Settings).filter(models.Settings.key == "initial_cost").first()
-    initial_cost = float(initial_cost_setting.value) if initial_cost_setting else 0.0
-    
-    # Get retail price from settings
-    retail_price_setting = db.query(models.Settings).filter(models.Settings.key == "retail_price_per_500ml").first()
-    retail_price_per_500ml = float(retail_price_setting.value) if retail_price_setting else 45.0
-    
-    # Calculate total cost (initial cost + CO2 cost)
-    co2_cost = 0.0
-    for log in logs:
-        cylinder_cost = log.cylinder.cost if log.cylinder else 0
-        max_pushes = log.cylinder.max_pushes if log.cylinder else 150
-        # Cost per push = cylinder_cost / max_pushes_per_cylinder
-        cost_per_push = cylinder_cost / max_pushes if cylinder_cost > 0 and max_pushes > 0 else 0
-        co2_cost += log.co2_pushes * cost_per_push
-    
-    total_cost = initial_cost + co2_cost
+    # Total cost (initial cost + CO2 cost)
+    total_cost = initial_cost + float(daily["co2_cost"].sum())
     
     cost_per_liter = (total_cost / (total_consumption_ml / 1000)) if total_consumption_ml > 0 else 0
     
-    # Prepare consumption data for charts (grouped by date)
-    daily_data = {}
-    cumulative_volume = 0
-    cumulative_co2_cost = 0
-    cumulative_retail_cost = 0
-    
-    # Sort logs by date to calculate cumulative data correctly
-    sorted_logs = sorted(logs, key=lambda x: x.date)
-    
-    for log in sorted_logs:
-        date_str = log.date.isoformat()
-        
-        # Calculate CO2 cost for this log
-        cylinder_cost = log.cylinder.cost if log.cylinder else 0
-        max_pushes = log.cylinder.max_pushes if log.cylinder else 150
-        cost_per_push = cylinder_cost / max_pushes if cylinder_cost > 0 and max_pushes > 0 else 0
-        log_co2_cost = log.co2_pushes * cost_per_push
-        
-        # Calculate retail cost for this log
-        log_retail_cost = (log.volume_ml * retail_price_per_500ml) / 500
-        
-        # Update cumulative values
-        cumulative_volume += log.volume_ml
-        cumulative_co2_cost += log_co2_cost
-        cumulative_retail_cost += log_retail_cost
-        
-        # Calculate total cost (initial cost + cumulative CO2 cost)
-        total_cost = initial_cost + cumulative_co2_cost
-        
-        # Group by date
-        if date_str not in daily_data:
-            daily_data[date_str] = {
-                "date": date_str,
-                "volume_ml": 0,
-                "co2_cost": 0,
-                "retail_cost": cumulative_retail_cost,
-                "cumulative_volume_ml": cumulative_volume,
-                "total_cost": total_cost
-            }
-        
-        daily_data[date_str]["volume_ml"] += log.volume_ml
-        daily_data[date_str]["co2_cost"] += log_co2_cost
-        daily_data[date_str]["retail_cost"] = cumulative_retail_cost
-        daily_data[date_str]["cumulative_volume_ml"] = cumulative_volume
-        daily_data[date_str]["total_cost"] = total_cost
-    
-    consumption_data = list(daily_data.values())
+    daily["date"] = [d.isoformat() for d in daily["date"]]
+    consumption_data = daily[[
+        "date", "volume_ml", "co2_cost", "retail_cost", "cumulative_volume_ml", "total_cost"
+    ]].to_dict("records")
     
     return schemas.AnalyticsResponse(
         total_consumption_ml=total_consumption_ml,
@@ -110,57 +53,103 @@ def get_analytics(
         consumption_data=consumption_data
     )
 
+@router.get("/scenarios", response_model=schemas.ScenarioResponse)
+def get_scenarios(
+    period: str = Query("all", regex="^(30d|90d|180d|365d|all)$"),
+    cylinder_cost_multipliers: Optional[List[float]] = Query(None, description="Scale every cylinder's recorded price, e.g. 1.2 for +20%"),
+    cylinder_costs: Optional[List[float]] = Query(None, description="Replace every cylinder's price with this amount"),
+    retail_prices: Optional[List[float]] = Query(None, description="Retail prices per 500ml; defaults to the current setting"),
+    db: Session = Depends(get_read_db),
+    household_id: int = Depends(get_household_id)
+):
+    """Evaluate hypothetical cylinder and retail prices over the history in one pass"""
+    for name, values in (
+        ("cylinder_cost_multipliers", cylinder_cost_multipliers),
+        ("cylinder_costs", cylinder_costs),
+        ("retail_prices", retail_prices),
+    ):
+        if values and any(value < 0 for value in values):
+            raise HTTPException(status_code=400, detail=f"{name} must not be negative")
+    
+    # Default to the current prices so the first scenario is the baseline
+    multipliers = cylinder_cost_multipliers or []
+    absolute_costs = cylinder_costs or []
+    if not multipliers and not absolute_costs:
+        multipliers = [1.0]
+    
+    initial_cost, retail_price_per_500ml = costs.load_pricing(db, household_id)
+    retail_prices = retail_prices or [retail_price_per_500ml]
+    
+    cylinder_scenarios = len(multipliers) + len(absolute_costs)
+    if cylinder_scenarios * len(retail_prices) > MAX_SCENARIOS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_SCENARIOS} scenarios can be evaluated at once")
+    
+    period_days = None
+    start_date = None
+    if period != "all":
+        period_days = int(period.replace('d', ''))
+        start_date = date.today() - timedelta(days=period_days)
+    
+    usage = costs.load_usage(db, household_id, start_date, date.today() if start_date else None)
+    results = costs.evaluate_scenarios(usage, initial_cost, retail_prices, multipliers, absolute_costs)
+    
+    cylinder_labels = (
+        [{"cylinder_cost_multiplier": m, "cylinder_cost": None} for m in multipliers] +
+        [{"cylinder_cost_multiplier": None, "cylinder_cost": c} for c in absolute_costs]
+    )
+    scenarios = []
+    for i, label in enumerate(cylinder_labels):
+        for j, retail_price in enumerate(retail_prices):
+            scenarios.append(schemas.Scenario(
+                **label,
+                retail_price_per_500ml=retail_price,
+                **{name: float(values[i, j]) for name, values in results.items()}
+            ))
+    
+    return schemas.ScenarioResponse(
+        period_days=period_days,
+        total_consumption_ml=float(usage["volume_ml"].sum()),
+        initial_cost=initial_cost,
+        scenarios=scenarios
+    )
+
 @router.get("/dashboard", response_model=schemas.DashboardSummary)
-def get_dashboard_summary(db: Session = Depends(get_db)):
+def get_dashboard_summary(db: Session = Depends(get_read_db), household_id: int = Depends(get_household_id)):
     today = date.today()
     
     # Today's consumption
     today_logs = db.query(models.ConsumptionLog).filter(
+        models.ConsumptionLog.household_id == household_id,
         models.ConsumptionLog.date == today
     ).all()
     today_consumption_ml = sum(log.volume_ml for log in today_logs)
     
     # This month's cost
     month_start = today.replace(day=1)
-    month_logs = db.query(models.ConsumptionLog).filter(
-        models.ConsumptionLog.date >= month_start,
-        models.ConsumptionLog.date <= today
-    ).all()
-    
-    # Get initial cost from settings
-    initial_cost_setting = db.query(models.Settings).filter(models.Settings.key == "initial_cost").first()
-    initial_cost = float(initial_cost_setting.value) if initial_cost_setting else 0.0
-    
-    # Get retail price from settings
-    retail_price_setting = db.query(models.Settings).filter(models.Settings.key == "retail_price_per_500ml").first()
-    retail_price_per_500ml = float(retail_price_setting.value) if retail_price_setting else 45.0
+    month_usage = costs.load_usage(db, household_id, month_start, today)
+    initial_cost, retail_price_per_500ml = costs.load_pricing(db, household_id)
     
-    this_month_co2_cost = 0.0
-    this_month_consumption_ml = 0.0
-    for log in month_logs:
-        this_month_consumption_ml += log.volume_ml
-        cylinder_cost = log.cylinder.cost if log.cylinder else 0
-        max_pushes = log.cylinder.max_pushes if log.cylinder else 150
-        cost_per_push = cylinder_cost / max_pushes if cylinder_cost > 0 and max_pushes > 0 else 0
-        this_month_co2_cost += log.co2_pushes * cost_per_push
+    this_month_co2_cost = float(costs.co2_cost(month_usage).sum())
+    this_month_consumption_ml = float(month_usage["volume_ml"].sum())
     
     # For monthly cost, we include the full initial cost
     # This represents the total cost investment for the month's consumption
     this_month_cost = initial_cost + this_month_co2_cost
     
     # Calculate savings vs retail using settings
-    retail_cost_per_ml = retail_price_per_500ml / 500  # JPY per mL
-    retail_cost_this_month = this_month_consumption_ml * retail_cost_per_ml
+    retail_cost_this_month = float(costs.retail_cost(this_month_consumption_ml, retail_price_per_500ml))
     savings_vs_retail = retail_cost_this_month - this_month_cost
     
     # Active cylinder
     active_cylinder = db.query(models.Cylinder).filter(
+        models.Cylinder.household_id == household_id,
         models.Cylinder.is_active == True
     ).first()
     
     # Recent consumption data (last 30 days)
     thirty_days_ago = today - timedelta(days=30)
     recent_logs = db.query(models.ConsumptionLog).filter(
+        models.ConsumptionLog.household_id == household_id,
         models.ConsumptionLog.date >= thirty_days_ago,
         models.ConsumptionLog.date <= today
     ).all()
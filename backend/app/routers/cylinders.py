@@ -1,40 +1,40 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from sqlalchemy import func
-from app.database import get_db
+from app.database import get_db, get_read_db, get_household_id
 from app import models, schemas
 from typing import List
 
 router = APIRouter()
 
 @router.get("/", response_model=List[schemas.Cylinder])
-def get_cylinders(db: Session = Depends(get_db)):
-    cylinders = db.query(models.Cylinder).order_by(models.Cylinder.number).all()
+def get_cylinders(db: Session = Depends(get_db), household_id: int = Depends(get_household_id)):
+    cylinders = db.query(models.Cylinder).filter(models.Cylinder.household_id == household_id).order_by(models.Cylinder.number).all()
     return cylinders
 
 @router.post("/", response_model=schemas.Cylinder)
-def create_cylinder(cylinder: schemas.CylinderCreate, db: Session = Depends(get_db)):
+def create_cylinder(cylinder: schemas.CylinderCreate, db: Session = Depends(get_db), household_id: int = Depends(get_household_id)):
     # Check if cylinder number already exists
-    existing = db.query(models.Cylinder).filter(models.Cylinder.number == cylinder.number).first()
+    existing = db.query(models.Cylinder).filter(models.Cylinder.household_id == household_id, models.Cylinder.number == cylinder.number).first()
     if existing:
         raise HTTPException(status_code=400, detail="Cylinder number already exists")
     
-    db_cylinder = models.Cylinder(**cylinder.dict())
+    db_cylinder = models.Cylinder(**cylinder.dict(), household_id=household_id)
     db.add(db_cylinder)
     db.commit()
     db.refresh(db_cylinder)
     return db_cylinder
 
 @router.get("/{cylinder_id}", response_model=schemas.Cylinder)
-def get_cylinder(cylinder_id: int, db: Session = Depends(get_db)):
-    cylinder = db.query(models.Cylinder).filter(models.Cylinder.id == cylinder_id).first()
+def get_cylinder(cylinder_id: int, db: Session = Depends(get_db), household_id: int = Depends(get_household_id)):
+    cylinder = db.query(models.Cylinder).filter(models.Cylinder.household_id == household_id, models.Cylinder.id == cylinder_id).first()
     if not cylinder:
         raise HTTPException(status_code=404, detail="Cylinder not found")
     return cylinder
 
 @router.put("/{cylinder_id}", response_model=schemas.Cylinder)
-def update_cylinder(cylinder_id: int, cylinder_update: schemas.CylinderUpdate, db: Session = Depends(get_db)):
-    db_cylinder = db.query(models.Cylinder).filter(models.Cylinder.id == cylinder_id).first()
+def update_cylinder(cylinder_id: int, cylinder_update: schemas.CylinderUpdate, db: Session = Depends(get_db), household_id: int = Depends(get_household_id)):
+    db_cylinder = db.query(models.Cylinder).filter(models.Cylinder.household_id == household_id, models.Cylinder.id == cylinder_id).first()
     if not db_cylinder:
         raise HTTPException(status_code=404, detail="Cylinder not found")
     
@@ -47,13 +47,14 @@ def update_cylinder(cylinder_id: int, cylinder_update: schemas.CylinderUpdate, d
     return db_cylinder
 
 @router.delete("/{cylinder_id}")
-def delete_cylinder(cylinder_id: int, db: Session = Depends(get_db)):
-    cylinder = db.query(models.Cylinder).filter(models.Cylinder.id == cylinder_id).first()
+def delete_cylinder(cylinder_id: int, db: Session = Depends(get_db), household_id: int = Depends(get_household_id)):
+    cylinder = db.query(models.Cylinder).filter(models.Cylinder.household_id == household_id, models.Cylinder.id == cylinder_id).first()
     if not cylinder:
         raise HTTPException(status_code=404, detail="Cylinder not found")
     
     # Check if cylinder has associated logs
-    log_count = db.query(models.ConsumptionLog).filter(models.ConsumptionLog.cylinder_id == cylinder_id).count()
+    log_count = db.query(models.ConsumptionLog).filter(models.ConsumptionLog.household_id == household_id, models.ConsumptionLog.cylinder_id == cylinder_id).count()
+    log_count += db.query(models.ConsumptionLogArchive).filter(models.ConsumptionLogArchive.household_id == household_id, models.ConsumptionLogArchive.cylinder_id == cylinder_id).count()
     if log_count > 0:
         raise HTTPException(status_code=400, detail="Cannot delete cylinder with associated consumption logs")
     
@@ -62,12 +63,12 @@ def delete_cylinder(cylinder_id: int, db: Session = Depends(get_db)):
     return {"message": "Cylinder deleted successfully"}
 
 @router.post("/change-active")
-def change_active_cylinder(new_cylinder_id: int, db: Session = Depends(get_db)):
-    # Deactivate all cylinders
-    db.query(models.Cylinder).update({models.Cylinder.is_active: False})
+def change_active_cylinder(new_cylinder_id: int, db: Session = Depends(get_db), household_id: int = Depends(get_household_id)):
+    # Deactivate all of the household's cylinders
+    db.query(models.Cylinder).filter(models.Cylinder.household_id == household_id).update({models.Cylinder.is_active: False})
     
     # Activate the new cylinder
-    new_cylinder = db.query(models.Cylinder).filter(models.Cylinder.id == new_cylinder_id).first()
+    new_cylinder = db.query(models.Cylinder).filter(models.Cylinder.household_id == household_id, models.Cylinder.id == new_cylinder_id).first()
     if not new_cylinder:
         raise HTTPException(status_code=404, detail="Cylinder not found")
     
@@ -77,25 +78,36 @@ def change_active_cylinder(new_cylinder_id: int, db: Session = Depends(get_db)):
     return {"message": f"Cylinder #{new_cylinder.number} is now active"}
 
 @router.get("/{cylinder_id}/date-range")
-def get_cylinder_date_range(cylinder_id: int, db: Session = Depends(get_db)):
+def get_cylinder_date_range(cylinder_id: int, db: Session = Depends(get_read_db), household_id: int = Depends(get_household_id)):
     """Get the date range of logs associated with this cylinder"""
     date_range = db.query(
         func.min(models.ConsumptionLog.date).label('start_date'),
         func.max(models.ConsumptionLog.date).label('end_date')
-    ).filter(models.ConsumptionLog.cylinder_id == cylinder_id).first()
+    ).filter(models.ConsumptionLog.household_id == household_id, models.ConsumptionLog.cylinder_id == cylinder_id).first()
+    
+    # Older logs may have been moved to the archive
+    archived_start = db.query(
+        func.min(models.ConsumptionLogArchive.date)
+    ).filter(models.ConsumptionLogArchive.household_id == household_id, models.ConsumptionLogArchive.cylinder_id == cylinder_id).scalar()
     
     return {
-        "start_date": date_range.start_date,
-        "end_date": date_range.end_date
+        "start_date": archived_start or date_range.start_date,
+        "end_date": date_range.end_date or db.query(
+            func.max(models.ConsumptionLogArchive.date)
+        ).filter(models.ConsumptionLogArchive.household_id == household_id, models.ConsumptionLogArchive.cylinder_id == cylinder_id).scalar()
     }
 
 @router.get("/{cylinder_id}/total-pushes")
-def get_cylinder_total_pushes(cylinder_id: int, db: Session = Depends(get_db)):
+def get_cylinder_total_pushes(cylinder_id: int, db: Session = Depends(get_read_db), household_id: int = Depends(get_household_id)):
     """Get the total number of CO2 pushes for this cylinder"""
     total_pushes = db.query(
         func.sum(models.ConsumptionLog.co2_pushes).label('total_pushes')
-    ).filter(models.ConsumptionLog.cylinder_id == cylinder_id).scalar()
+    ).filter(models.ConsumptionLog.household_id == household_id, models.ConsumptionLog.cylinder_id == cylinder_id).scalar()
+    
+    archived_pushes = db.query(
+        func.sum(models.ConsumptionLogArchive.co2_pushes)
+    ).filter(models.ConsumptionLogArchive.household_id == household_id, models.ConsumptionLogArchive.cylinder_id == cylinder_id).scalar()
     
     return {
-        "total_pushes": total_pushes or 0
+        "total_pushes": (total_pushes or 0) + (archived_pushes or 0)
     }
\ No newline at end of file
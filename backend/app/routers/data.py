@@ -1,106 +1,126 @@
-from fastapi import APIRouter, Depends, UploadFile, File, HTTPException
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Query, Request
 from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from app.database import get_db
-from app import models
-from app.routers.logs import calculate_volume_and_pushes
+from app.database import get_db, get_read_db, get_household_id, read_session_factory
+from app import models, schemas, import_jobs, columnar
 import pandas as pd
 import io
+import os
+import shutil
+import uuid
 from datetime import datetime
 
 router = APIRouter()
 
-@router.post("/import")
-async def import_csv(file: UploadFile = File(...), db: Session = Depends(get_db)):
-    if not file.filename.endswith('.csv'):
-        raise HTTPException(status_code=400, detail="File must be a CSV")
+@router.post("/import", response_model=schemas.ImportJob, status_code=202)
+def import_csv(
+    file: UploadFile = File(...),
+    on_conflict: str = Query("skip", regex="^(skip|update)$"),
+    db: Session = Depends(get_db),
+    household_id: int = Depends(get_household_id)
+):
+    """Spool an uploaded CSV, Parquet or Arrow file to disk and queue it for a background import.
+    
+    Rows are identified by a content hash, so re-importing overlapping data
+    skips (or with on_conflict=update, refreshes) logs that already exist.
+    """
+    fmt = columnar.format_for_filename(file.filename)
+    if not fmt and not file.filename.endswith('.csv'):
+        raise HTTPException(status_code=400, detail="File must be a CSV, Parquet or Arrow file")
+    
+    # Uploads of long-failed jobs are dropped before spooling another one
+    import_jobs.purge_expired_uploads(db)
+    
+    job_id = uuid.uuid4().hex
+    path = import_jobs.spool_path(job_id, columnar.FORMATS[fmt]["extension"] if fmt else ".csv")
     
     try:
-        # Read CSV file
-        contents = await file.read()
-        df = pd.read_csv(io.StringIO(contents.decode('utf-8')))
+        with open(path, "wb") as out:
+            shutil.copyfileobj(file.file, out)
         
-        # Validate required columns
-        required_columns = ['date', 'bottle_size', 'bottle_count', 'cylinder_number']
-        if not all(col in df.columns for col in required_columns):
+        # Validate required columns from the header or schema only
+        columns = import_jobs.read_columns(path)
+        required_columns = import_jobs.REQUIRED_COLUMNS
+        if not all(col in columns for col in required_columns):
             raise HTTPException(
                 status_code=400, 
                 detail=f"CSV must contain columns: {', '.join(required_columns)}"
             )
-        
-        imported_count = 0
-        errors = []
-        
-        for index, row in df.iterrows():
-            try:
-                # Find or create cylinder
-                cylinder = db.query(models.Cylinder).filter(
-                    models.Cylinder.number == int(row['cylinder_number'])
-                ).first()
-                
-                if not cylinder:
-                    # Create new cylinder if it doesn't exist
-                    cylinder = models.Cylinder(
-                        number=int(row['cylinder_number']),
-                        cost=0.0
-                    )
-                    db.add(cylinder)
-                    db.flush()  # Get the ID
-                
-                # Calculate volume and pushes
-                volume_ml, co2_pushes = calculate_volume_and_pushes(
-                    row['bottle_size'], 
-                    int(row['bottle_count'])
-                )
-                
-                # Create consumption log
-                log = models.ConsumptionLog(
-                    date=pd.to_datetime(row['date']).date(),
-                    bottle_size=row['bottle_size'],
-                    bottle_count=int(row['bottle_count']),
-                    volume_ml=volume_ml,
-                    co2_pushes=co2_pushes,
-                    cylinder_id=cylinder.id
-                )
-                
-                db.add(log)
-                imported_count += 1
-                
-            except Exception as e:
-                errors.append(f"Row {index + 1}: {str(e)}")
-        
-        db.commit()
-        
-        return {
-            "message": f"Successfully imported {imported_count} records",
-            "imported_count": imported_count,
-            "errors": errors[:10]  # Limit to first 10 errors
-        }
-        
     except Exception as e:
+        if os.path.exists(path):
+            os.remove(path)
+        if isinstance(e, HTTPException):
+            raise
         raise HTTPException(status_code=400, detail=f"Error processing CSV: {str(e)}")
+    
+    job = models.ImportJob(
+        id=job_id,
+        household_id=household_id,
+        filename=file.filename,
+        file_path=path,
+        conflict_mode=on_conflict
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    
+    import_jobs.submit(job.id)
+    return job
+
+@router.get("/import/{job_id}", response_model=schemas.ImportJob)
+def get_import_job(job_id: str, db: Session = Depends(get_db), household_id: int = Depends(get_household_id)):
+    """Report progress, row counts and errors of an import job"""
+    # A job whose process went away is reported as failed so it can be resumed
+    import_jobs.expire_orphaned(db, job_id, household_id)
+    job = db.query(models.ImportJob).filter(models.ImportJob.household_id == household_id, models.ImportJob.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    return job
+
+@router.post("/import/{job_id}/resume", response_model=schemas.ImportJob, status_code=202)
+def resume_import_job(job_id: str, db: Session = Depends(get_db), household_id: int = Depends(get_household_id)):
+    """Restart a failed or interrupted import from the last committed chunk"""
+    job = db.query(models.ImportJob).filter(models.ImportJob.household_id == household_id, models.ImportJob.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    if job.status == "completed":
+        raise HTTPException(status_code=400, detail="Import job already completed")
+    if not job.file_path or not os.path.exists(job.file_path):
+        raise HTTPException(status_code=400, detail="Uploaded file is no longer available")
+    if not import_jobs.claim_for_resume(db, job.id, household_id):
+        raise HTTPException(status_code=400, detail="Import job is already running")
+    
+    db.refresh(job)
+    import_jobs.submit(job.id)
+    return job
 
 @router.get("/export")
-def export_csv(db: Session = Depends(get_db)):
-    # Get all consumption logs with cylinder information
-    logs = db.query(models.ConsumptionLog).join(models.Cylinder).all()
+def export_csv(
+    request: Request,
+    format: str = Query("csv", regex="^(csv|parquet|arrow)$"),
+    db: Session = Depends(get_read_db),
+    household_id: int = Depends(get_household_id)
+):
+    if format in columnar.FORMATS:
+        spec = columnar.FORMATS[format]
+        return StreamingResponse(
+            _stream_columnar(read_session_factory(request), format, household_id),
+            media_type=spec["media_type"],
+            headers={"Content-Disposition": f"attachment; filename=soda_consumption_export{spec['extension']}"}
+        )
     
-    # Prepare data for CSV
-    data = []
-    for log in logs:
-        data.append({
-            'date': log.date.isoformat(),
-            'bottle_size': log.bottle_size,
-            'bottle_count': log.bottle_count,
-            'volume_ml': log.volume_ml,
-            'co2_pushes': log.co2_pushes,
-            'cylinder_number': log.cylinder.number,
-            'cylinder_cost': log.cylinder.cost,
-            'created_at': log.created_at.isoformat()
-        })
+    # Archived daily summaries and logs, with cylinder information
+    data = [
+        dict(zip(columnar.EXPORT_SCHEMA.names, row))
+        for rows in columnar.export_rows(db, household_id)
+        for row in rows
+    ]
+    for row in data:
+        row['date'] = row['date'].isoformat()
+        row['created_at'] = row['created_at'].isoformat() if row['created_at'] else None
     
     # Create DataFrame and CSV
-    df = pd.DataFrame(data)
+    df = pd.DataFrame(data, columns=columnar.EXPORT_SCHEMA.names)
     
     # Create CSV in memory
     output = io.StringIO()
@@ -116,6 +136,14 @@ def export_csv(db: Session = Depends(get_db)):
     
     return response
 
+def _stream_columnar(session_factory, fmt: str, household_id: int):
+    # The response outlives the request's session, so stream from a dedicated one
+    db = session_factory()
+    try:
+        yield from columnar.stream_export(db, household_id, fmt)
+    finally:
+        db.close()
+
 @router.get("/sample-csv")
 def get_sample_csv():
     """Download a sample CSV file for import reference"""
@@ -1,9 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
-from app.database import get_db
+from app.database import get_db, get_read_db, get_household_id
 from app import models, schemas
 from typing import List
 from datetime import datetime, date
+import hashlib
 
 router = APIRouter()
 
@@ -23,13 +24,25 @@ def calculate_volume_and_pushes(bottle_size: str, bottle_count: int):
     
     return total_volume, total_pushes
 
+def compute_log_hash(log_date: date, bottle_size: str, bottle_count: int, cylinder_number: int, discriminator: str):
+    """Content hash identifying a consumption log across imports.
+    
+    The discriminator separates otherwise identical logs: the creation timestamp
+    for logs entered in the app, or the occurrence number within an import file.
+    """
+    key = "|".join([log_date.isoformat(), bottle_size, str(bottle_count), str(cylinder_number), discriminator])
+    return hashlib.sha256(key.encode()).hexdigest()
+
 @router.get("/", response_model=List[schemas.ConsumptionLog])
-def get_consumption_logs(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    logs = db.query(models.ConsumptionLog).offset(skip).limit(limit).all()
+def get_consumption_logs(skip: int = 0, limit: int = 100, db: Session = Depends(get_read_db), household_id: int = Depends(get_household_id)):
+    # Newest first with a stable order, so pages don't overlap
+    logs = db.query(models.ConsumptionLog).filter(models.ConsumptionLog.household_id == household_id).order_by(
+        models.ConsumptionLog.date.desc(), models.ConsumptionLog.id.desc()
+    ).offset(skip).limit(limit).all()
     return logs
 
 @router.post("/", response_model=schemas.ConsumptionLog)
-def create_consumption_log(log: schemas.ConsumptionLogCreate, db: Session = Depends(get_db)):
+def create_consumption_log(log: schemas.ConsumptionLogCreate, db: Session = Depends(get_db), household_id: int = Depends(get_household_id)):
     # Calculate volume
     volume_ml, default_co2_pushes = calculate_volume_and_pushes(log.bottle_size, log.bottle_count)
     
@@ -37,17 +50,21 @@ def create_consumption_log(log: schemas.ConsumptionLogCreate, db: Session = Depe
     co2_pushes = log.co2_pushes if log.co2_pushes is not None else default_co2_pushes
     
     # Verify cylinder exists
-    cylinder = db.query(models.Cylinder).filter(models.Cylinder.id == log.cylinder_id).first()
+    cylinder = db.query(models.Cylinder).filter(models.Cylinder.household_id == household_id, models.Cylinder.id == log.cylinder_id).first()
     if not cylinder:
         raise HTTPException(status_code=404, detail="Cylinder not found")
     
+    created_at = datetime.utcnow()
     db_log = models.ConsumptionLog(
+        household_id=household_id,
         date=log.date,
         bottle_size=log.bottle_size,
         bottle_count=log.bottle_count,
         volume_ml=volume_ml,
         co2_pushes=co2_pushes,
-        cylinder_id=log.cylinder_id
+        cylinder_id=log.cylinder_id,
+        created_at=created_at,
+        row_hash=compute_log_hash(log.date, log.bottle_size, log.bottle_count, cylinder.number, created_at.isoformat())
     )
     
     db.add(db_log)
@@ -56,15 +73,15 @@ def create_consumption_log(log: schemas.ConsumptionLogCreate, db: Session = Depe
     return db_log
 
 @router.get("/{log_id}", response_model=schemas.ConsumptionLog)
-def get_consumption_log(log_id: int, db: Session = Depends(get_db)):
-    log = db.query(models.ConsumptionLog).filter(models.ConsumptionLog.id == log_id).first()
+def get_consumption_log(log_id: int, db: Session = Depends(get_db), household_id: int = Depends(get_household_id)):
+    log = db.query(models.ConsumptionLog).filter(models.ConsumptionLog.household_id == household_id, models.ConsumptionLog.id == log_id).first()
     if not log:
         raise HTTPException(status_code=404, detail="Log not found")
     return log
 
 @router.put("/{log_id}", response_model=schemas.ConsumptionLog)
-def update_consumption_log(log_id: int, log_update: schemas.ConsumptionLogUpdate, db: Session = Depends(get_db)):
-    db_log = db.query(models.ConsumptionLog).filter(models.ConsumptionLog.id == log_id).first()
+def update_consumption_log(log_id: int, log_update: schemas.ConsumptionLogUpdate, db: Session = Depends(get_db), household_id: int = Depends(get_household_id)):
+    db_log = db.query(models.ConsumptionLog).filter(models.ConsumptionLog.household_id == household_id, models.ConsumptionLog.id == log_id).first()
     if not db_log:
         raise HTTPException(status_code=404, detail="Log not found")
     
@@ -78,8 +95,9 @@ def update_consumption_log(log_id: int, log_update: schemas.ConsumptionLogUpdate
             raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD")
     
     # Verify cylinder exists if cylinder_id is being updated
+    cylinder = db_log.cylinder
     if "cylinder_id" in update_data:
-        cylinder = db.query(models.Cylinder).filter(models.Cylinder.id == update_data["cylinder_id"]).first()
+        cylinder = db.query(models.Cylinder).filter(models.Cylinder.household_id == household_id, models.Cylinder.id == update_data["cylinder_id"]).first()
         if not cylinder:
             raise HTTPException(status_code=404, detail="Cylinder not found")
     
@@ -97,13 +115,19 @@ def update_consumption_log(log_id: int, log_update: schemas.ConsumptionLogUpdate
     for field, value in update_data.items():
         setattr(db_log, field, value)
     
+    # Keep the content hash in step with the identifying fields
+    if {"date", "bottle_size", "bottle_count", "cylinder_id"} & update_data.keys():
+        db_log.row_hash = compute_log_hash(
+            db_log.date, db_log.bottle_size, db_log.bottle_count, cylinder.number, db_log.created_at.isoformat()
+        )
+    
     db.commit()
     db.refresh(db_log)
     return db_log
 
 @router.delete("/{log_id}")
-def delete_consumption_log(log_id: int, db: Session = Depends(get_db)):
-    log = db.query(models.ConsumptionLog).filter(models.ConsumptionLog.id == log_id).first()
+def delete_consumption_log(log_id: int, db: Session = Depends(get_db), household_id: int = Depends(get_household_id)):
+    log = db.query(models.ConsumptionLog).filter(models.ConsumptionLog.household_id == household_id, models.ConsumptionLog.id == log_id).first()
     if not log:
         raise HTTPException(status_code=404, detail="Log not found")
     
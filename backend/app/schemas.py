@@ -74,9 +74,44 @@ class AnalyticsResponse(BaseModel):
     period_days: int
     consumption_data: List[dict]
 
+class Scenario(BaseModel):
+    cylinder_cost_multiplier: Optional[float]
+    cylinder_cost: Optional[float]
+    retail_price_per_500ml: float
+    co2_cost: float
+    total_cost: float
+    retail_cost: float
+    savings: float
+    cost_per_liter: float
+
+class ScenarioResponse(BaseModel):
+    period_days: Optional[int]
+    total_consumption_ml: float
+    initial_cost: float
+    scenarios: List[Scenario]
+
 class DashboardSummary(BaseModel):
     today_consumption_ml: float
     this_month_cost: float
     savings_vs_retail: float
     active_cylinder: Optional[Cylinder]
-    recent_consumption_data: List[dict]
\ No newline at end of file
+    recent_consumption_data: List[dict]
+
+class ImportJob(BaseModel):
+    id: str
+    filename: str
+    status: str
+    total_rows: Optional[int]
+    processed_rows: int
+    conflict_mode: str
+    imported_count: int
+    updated_count: int
+    skipped_count: int
+    error_count: int
+    errors: List[str]
+    error_message: Optional[str]
+    created_at: datetime
+    updated_at: datetime
+    
+    class Config:
+        from_attributes = True
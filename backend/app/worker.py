@@ -0,0 +1,7 @@
+"""Gunicorn worker class for production serving (see gunicorn.conf.py)."""
+from uvicorn.workers import UvicornWorker as BaseUvicornWorker
+
+class UvicornWorker(BaseUvicornWorker):
+    # Require the C event loop and HTTP parser from uvicorn[standard] rather
+    # than silently falling back to asyncio and h11
+    CONFIG_KWARGS = {"loop": "uvloop", "http": "httptools"}
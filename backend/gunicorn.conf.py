@@ -0,0 +1,36 @@
+"""Production serving profile: gunicorn managing uvicorn workers.
+
+    gunicorn -c gunicorn.conf.py app.main:app
+
+Every setting can be overridden from the environment.
+"""
+import multiprocessing
+import os
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+worker_class = "app.worker.UvicornWorker"
+
+# Import the app (and run migrations) once in the master before forking
+preload_app = True
+
+keepalive = int(os.getenv("KEEPALIVE", "5"))
+timeout = int(os.getenv("WORKER_TIMEOUT", "60"))
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", "30"))
+backlog = int(os.getenv("BACKLOG", "2048"))
+
+# Recycling workers bounds memory growth but interrupts any import running
+# in the recycled worker (it is marked failed and must be resumed), so it is
+# off unless MAX_REQUESTS is set
+max_requests = int(os.getenv("MAX_REQUESTS", "0"))
+max_requests_jitter = int(os.getenv("MAX_REQUESTS_JITTER", "0"))
+
+accesslog = os.getenv("ACCESS_LOG", "-")
+errorlog = "-"
+
+def post_fork(server, worker):
+    # Connections opened by the master during preload must not be shared
+    # across processes; each worker starts with fresh pools
+    from app.database import engine, read_engine
+    engine.dispose(close=False)
+    read_engine.dispose(close=False)
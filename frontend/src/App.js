@@ -1,26 +1,30 @@
-import React from 'react';
+import React, { lazy, Suspense } from 'react';
 import { BrowserRouter as Router, Routes, Route } from 'react-router-dom';
 import Navigation from './components/Navigation';
-import DashboardView from './views/DashboardView';
-import HistoryView from './views/HistoryView';
-import AnalyticsView from './views/AnalyticsView';
-import CylindersView from './views/CylindersView';
-import SettingsView from './views/SettingsView';
 import './App.css';
 
+// Each view is its own chunk, so recharts only loads with the views that draw charts
+const DashboardView = lazy(() => import('./views/DashboardView'));
+const HistoryView = lazy(() => import('./views/HistoryView'));
+const AnalyticsView = lazy(() => import('./views/AnalyticsView'));
+const CylindersView = lazy(() => import('./views/CylindersView'));
+const SettingsView = lazy(() => import('./views/SettingsView'));
+
 function App() {
   return (
     <Router>
       <div className="App">
         <Navigation />
         <main className="main-content">
-          <Routes>
-            <Route path="/" element={<DashboardView />} />
-            <Route path="/history" element={<HistoryView />} />
-            <Route path="/analytics" element={<AnalyticsView />} />
-            <Route path="/cylinders" element={<CylindersView />} />
-            <Route path="/settings" element={<SettingsView />} />
-          </Routes>
+          <Suspense fallback={<div className="loading">Loading...</div>}>
+            <Routes>
+              <Route path="/" element={<DashboardView />} />
+              <Route path="/history" element={<HistoryView />} />
+              <Route path="/analytics" element={<AnalyticsView />} />
+              <Route path="/cylinders" element={<CylindersView />} />
+              <Route path="/settings" element={<SettingsView />} />
+            </Routes>
+          </Suspense>
         </main>
       </div>
     </Router>
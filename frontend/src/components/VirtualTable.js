@@ -0,0 +1,44 @@
+import React, { useState } from 'react';
+
+// Table that only renders the rows scrolled into view (plus a few either side).
+// Rows must all be rowHeight pixels tall; spacer rows keep the scrollbar the
+// size of the full list. onEndReached fires when the last rows come into view.
+const VirtualTable = ({
+  rows,
+  header,
+  renderRow,
+  rowHeight = 50,
+  height = 600,
+  overscan = 10,
+  onEndReached,
+}) => {
+  const [scrollTop, setScrollTop] = useState(0);
+
+  const firstVisible = Math.floor(scrollTop / rowHeight);
+  const visibleCount = Math.ceil(height / rowHeight);
+  const start = Math.max(0, firstVisible - overscan);
+  const end = Math.min(rows.length, firstVisible + visibleCount + overscan);
+
+  const handleScroll = (e) => {
+    const { scrollTop: top, scrollHeight, clientHeight } = e.currentTarget;
+    setScrollTop(top);
+    if (onEndReached && scrollHeight - top - clientHeight < rowHeight * overscan) {
+      onEndReached();
+    }
+  };
+
+  return (
+    <div className="virtual-table" style={{ maxHeight: height }} onScroll={handleScroll}>
+      <table className="table">
+        <thead>{header}</thead>
+        <tbody>
+          {start > 0 && <tr style={{ height: start * rowHeight }} />}
+          {rows.slice(start, end).map((row) => renderRow(row, { height: rowHeight }))}
+          {end < rows.length && <tr style={{ height: (rows.length - end) * rowHeight }} />}
+        </tbody>
+      </table>
+    </div>
+  );
+};
+
+export default VirtualTable;
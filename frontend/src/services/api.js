@@ -13,55 +13,141 @@ const getApiBaseUrl = () => {
 
 const API_BASE_URL = getApiBaseUrl();
 
+// Household (tenant) whose data this frontend shows; without it the API
+// uses its DEFAULT_HOUSEHOLD_ID, if configured
+const HOUSEHOLD_ID = process.env.REACT_APP_HOUSEHOLD_ID;
+
 const api = axios.create({
   baseURL: `${API_BASE_URL}/api`,
+  // Sends the read-your-writes cookie so reads after a change hit the primary
+  withCredentials: true,
   headers: {
     'Content-Type': 'application/json',
+    ...(HOUSEHOLD_ID ? { 'X-Household-Id': HOUSEHOLD_ID } : {}),
   },
 });
 
+// Shared response cache for GET requests. Views get a cached response
+// immediately; once it is older than CACHE_MAX_AGE_MS it is still returned
+// but refetched in the background, and subscribers are told when the fresh
+// data differs. Concurrent requests for the same URL share one fetch.
+const CACHE_MAX_AGE_MS = 30 * 1000;
+const cache = new Map();
+const subscribers = new Set();
+
+// Keys include the household so switching tenants never serves another's data
+const cacheKey = (url) => `${HOUSEHOLD_ID || ''}:${url}`;
+
+const notify = (url) => {
+  subscribers.forEach((listener) => listener(url));
+};
+
+const revalidate = (key, url) => {
+  const entry = cache.get(key) || {};
+  if (entry.pending) {
+    return entry.pending;
+  }
+
+  const pending = api.get(url).then(
+    (response) => {
+      // Ignore responses for entries invalidated while the request was in flight
+      if (cache.get(key)?.pending === pending) {
+        cache.set(key, { response, fetchedAt: Date.now() });
+        if (entry.response && JSON.stringify(entry.response.data) !== JSON.stringify(response.data)) {
+          notify(url);
+        }
+      }
+      return response;
+    },
+    (error) => {
+      const current = cache.get(key);
+      if (current?.pending === pending) {
+        cache.set(key, { ...current, pending: null });
+      }
+      throw error;
+    }
+  );
+  cache.set(key, { ...entry, pending });
+  return pending;
+};
+
+const cachedGet = (url) => {
+  const key = cacheKey(url);
+  const entry = cache.get(key);
+  if (entry?.response) {
+    if (Date.now() - entry.fetchedAt > CACHE_MAX_AGE_MS) {
+      revalidate(key, url);
+    }
+    return Promise.resolve(entry.response);
+  }
+  return revalidate(key, url);
+};
+
+// Drop cached responses whose URL starts with one of the prefixes (all if none given)
+export const invalidateCache = (...prefixes) => {
+  const household = cacheKey('');
+  for (const key of cache.keys()) {
+    const url = key.slice(household.length);
+    if (key.startsWith(household) && (prefixes.length === 0 || prefixes.some((prefix) => url.startsWith(prefix)))) {
+      cache.delete(key);
+    }
+  }
+};
+
+// Call listener(url) whenever a background refetch brings new data; returns an unsubscribe function
+export const subscribeToCache = (listener) => {
+  subscribers.add(listener);
+  return () => subscribers.delete(listener);
+};
+
+// Run a mutation and invalidate the cached reads it affects once it succeeds
+const mutate = (request, ...prefixes) => request.then((response) => {
+  invalidateCache(...prefixes);
+  return response;
+});
+
 // Consumption Logs API
 export const logsApi = {
-  getAll: (skip = 0, limit = 100) => api.get(`/logs?skip=${skip}&limit=${limit}`),
-  getById: (id) => api.get(`/logs/${id}`),
-  create: (data) => api.post('/logs', data),
-  update: (id, data) => api.put(`/logs/${id}`, data),
-  delete: (id) => api.delete(`/logs/${id}`),
+  getAll: (skip = 0, limit = 100) => cachedGet(`/logs?skip=${skip}&limit=${limit}`),
+  getById: (id) => cachedGet(`/logs/${id}`),
+  create: (data) => mutate(api.post('/logs', data), '/logs', '/cylinders', '/analytics'),
+  update: (id, data) => mutate(api.put(`/logs/${id}`, data), '/logs', '/cylinders', '/analytics'),
+  delete: (id) => mutate(api.delete(`/logs/${id}`), '/logs', '/cylinders', '/analytics'),
 };
 
 // Cylinders API
 export const cylindersApi = {
-  getAll: () => api.get('/cylinders'),
-  getById: (id) => api.get(`/cylinders/${id}`),
-  create: (data) => api.post('/cylinders', data),
-  update: (id, data) => api.put(`/cylinders/${id}`, data),
-  delete: (id) => api.delete(`/cylinders/${id}`),
-  changeActive: (cylinderId) => api.post(`/cylinders/change-active?new_cylinder_id=${cylinderId}`),
-  getDateRange: (id) => api.get(`/cylinders/${id}/date-range`),
-  getTotalPushes: (id) => api.get(`/cylinders/${id}/total-pushes`),
+  getAll: () => cachedGet('/cylinders'),
+  getById: (id) => cachedGet(`/cylinders/${id}`),
+  create: (data) => mutate(api.post('/cylinders', data), '/cylinders', '/analytics'),
+  update: (id, data) => mutate(api.put(`/cylinders/${id}`, data), '/cylinders', '/logs', '/analytics'),
+  delete: (id) => mutate(api.delete(`/cylinders/${id}`), '/cylinders', '/analytics'),
+  changeActive: (cylinderId) => mutate(api.post(`/cylinders/change-active?new_cylinder_id=${cylinderId}`), '/cylinders', '/analytics'),
+  getDateRange: (id) => cachedGet(`/cylinders/${id}/date-range`),
+  getTotalPushes: (id) => cachedGet(`/cylinders/${id}/total-pushes`),
 };
 
 // Analytics API
 export const analyticsApi = {
-  getAnalytics: (period = '30d') => api.get(`/analytics?period=${period}`),
-  getDashboardSummary: () => api.get('/analytics/dashboard'),
+  getAnalytics: (period = '30d') => cachedGet(`/analytics?period=${period}`),
+  getDashboardSummary: () => cachedGet('/analytics/dashboard'),
 };
 
 // Settings API
 export const settingsApi = {
-  getAll: () => api.get('/settings'),
-  getBySetting: (key) => api.get(`/settings/${key}`),
-  create: (data) => api.post('/settings', data),
-  update: (key, data) => api.put(`/settings/${key}`, data),
-  delete: (key) => api.delete(`/settings/${key}`),
-  getRetailPrice: () => api.get('/settings/retail-price/current'),
-  updateRetailPrice: (price) => api.put(`/settings/retail-price/current?price=${price}`),
-  getInitialCost: () => api.get('/settings/initial-cost/current'),
-  updateInitialCost: (cost) => api.put(`/settings/initial-cost/current?cost=${cost}`),
-  getDefaultPushes1L: () => api.get('/settings/default-pushes-1l/current'),
-  updateDefaultPushes1L: (pushes) => api.put(`/settings/default-pushes-1l/current?pushes=${pushes}`),
-  getDefaultPushes05L: () => api.get('/settings/default-pushes-05l/current'),
-  updateDefaultPushes05L: (pushes) => api.put(`/settings/default-pushes-05l/current?pushes=${pushes}`),
+  getAll: () => cachedGet('/settings'),
+  getBySetting: (key) => cachedGet(`/settings/${key}`),
+  create: (data) => mutate(api.post('/settings', data), '/settings', '/analytics'),
+  update: (key, data) => mutate(api.put(`/settings/${key}`, data), '/settings', '/analytics'),
+  delete: (key) => mutate(api.delete(`/settings/${key}`), '/settings', '/analytics'),
+  getRetailPrice: () => cachedGet('/settings/retail-price/current'),
+  updateRetailPrice: (price) => mutate(api.put(`/settings/retail-price/current?price=${price}`), '/settings', '/analytics'),
+  getInitialCost: () => cachedGet('/settings/initial-cost/current'),
+  updateInitialCost: (cost) => mutate(api.put(`/settings/initial-cost/current?cost=${cost}`), '/settings', '/analytics'),
+  getDefaultPushes1L: () => cachedGet('/settings/default-pushes-1l/current'),
+  updateDefaultPushes1L: (pushes) => mutate(api.put(`/settings/default-pushes-1l/current?pushes=${pushes}`), '/settings'),
+  getDefaultPushes05L: () => cachedGet('/settings/default-pushes-05l/current'),
+  updateDefaultPushes05L: (pushes) => mutate(api.put(`/settings/default-pushes-05l/current?pushes=${pushes}`), '/settings'),
 };
 
 // Data Import/Export API
@@ -75,6 +161,8 @@ export const dataApi = {
       },
     });
   },
+  getImportJob: (jobId) => api.get(`/data/import/${jobId}`),
+  resumeImportJob: (jobId) => api.post(`/data/import/${jobId}/resume`),
   exportCsv: () => api.get('/data/export', { responseType: 'blob' }),
   getSampleCsv: () => api.get('/data/sample-csv', { responseType: 'blob' }),
 };
@@ -1,6 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import { LineChart, Line, XAxis, YAxis, CartesianGrid, Tooltip, ResponsiveContainer, ReferenceLine } from 'recharts';
-import { analyticsApi, settingsApi } from '../services/api';
+import { analyticsApi, settingsApi, subscribeToCache } from '../services/api';
 
 const AnalyticsView = () => {
   const [analytics, setAnalytics] = useState(null);
@@ -11,15 +11,17 @@ const AnalyticsView = () => {
 
   useEffect(() => {
     loadAnalytics();
+    // Pick up fresh data when a cached response is revalidated in the background
+    return subscribeToCache(loadAnalytics);
   }, [selectedPeriod]);
 
   useEffect(() => {
     loadRetailPrice();
+    return subscribeToCache(loadRetailPrice);
   }, []);
 
   const loadAnalytics = async () => {
     try {
-      setLoading(true);
       const response = await analyticsApi.getAnalytics(selectedPeriod);
       setAnalytics(response.data);
       setError(null);
@@ -1,7 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import { Link } from 'react-router-dom';
 import { LineChart, Line, XAxis, YAxis, CartesianGrid, Tooltip, ResponsiveContainer } from 'recharts';
-import { analyticsApi, logsApi, cylindersApi, settingsApi } from '../services/api';
+import { analyticsApi, logsApi, cylindersApi, settingsApi, subscribeToCache } from '../services/api';
 import Counter from '../components/Counter';
 
 const DashboardView = () => {
@@ -28,9 +28,14 @@ const DashboardView = () => {
   };
 
   useEffect(() => {
-    loadDashboardData();
-    loadCylinders();
-    loadDefaultPushes();
+    const loadAll = () => {
+      loadDashboardData();
+      loadCylinders();
+      loadDefaultPushes();
+    };
+    loadAll();
+    // Pick up fresh data when a cached response is revalidated in the background
+    return subscribeToCache(loadAll);
   }, []);
 
   // Initialize CO2 pushes with default value
@@ -63,7 +68,6 @@ const DashboardView = () => {
 
   const loadDashboardData = async () => {
     try {
-      setLoading(true);
       const response = await analyticsApi.getDashboardSummary();
       setSummary(response.data);
       setError(null);
@@ -1,9 +1,14 @@
-import React, { useState, useEffect } from 'react';
-import { logsApi, cylindersApi, settingsApi } from '../services/api';
+import React, { useState, useEffect, useRef } from 'react';
+import { logsApi, cylindersApi, settingsApi, subscribeToCache } from '../services/api';
 import Counter from '../components/Counter';
+import VirtualTable from '../components/VirtualTable';
+
+// Logs are fetched this many at a time as the table is scrolled
+const PAGE_SIZE = 200;
 
 const HistoryView = () => {
   const [logs, setLogs] = useState([]);
+  const [hasMore, setHasMore] = useState(false);
   const [cylinders, setCylinders] = useState([]);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
@@ -12,6 +17,8 @@ const HistoryView = () => {
   const [showAddForm, setShowAddForm] = useState(false);
   const [defaultPushes1L, setDefaultPushes1L] = useState(4);
   const [defaultPushes05L, setDefaultPushes05L] = useState(2);
+  const pageCount = useRef(1);
+  const loadingMore = useRef(false);
   
   // Form state
   const [formData, setFormData] = useState({
@@ -31,6 +38,11 @@ const HistoryView = () => {
   useEffect(() => {
     loadData();
     loadDefaultPushes();
+    // Pick up fresh data when a cached response is revalidated in the background
+    return subscribeToCache(() => {
+      loadData();
+      loadDefaultPushes();
+    });
   }, []);
 
   // Update CO2 pushes when bottle size or count changes (only for new logs, not editing)
@@ -55,14 +67,17 @@ const HistoryView = () => {
     }
   };
 
+  // (Re)load every page shown so far; logs come newest first from the API
   const loadData = async () => {
     try {
-      setLoading(true);
-      const [logsResponse, cylindersResponse] = await Promise.all([
-        logsApi.getAll(),
+      const pages = Array.from({ length: pageCount.current }, (_, page) => logsApi.getAll(page * PAGE_SIZE, PAGE_SIZE));
+      const [cylindersResponse, ...pageResponses] = await Promise.all([
         cylindersApi.getAll(),
+        ...pages,
       ]);
-      setLogs(logsResponse.data.sort((a, b) => new Date(b.date) - new Date(a.date)));
+      const lastPage = pageResponses[pageResponses.length - 1].data;
+      setLogs(pageResponses.flatMap((response) => response.data));
+      setHasMore(lastPage.length === PAGE_SIZE);
       setCylinders(cylindersResponse.data);
       setError(null);
     } catch (err) {
@@ -73,6 +88,25 @@ const HistoryView = () => {
     }
   };
 
+  const loadMore = async () => {
+    if (loadingMore.current || !hasMore) {
+      return;
+    }
+
+    try {
+      loadingMore.current = true;
+      const response = await logsApi.getAll(pageCount.current * PAGE_SIZE, PAGE_SIZE);
+      pageCount.current += 1;
+      setLogs((prev) => [...prev, ...response.data]);
+      setHasMore(response.data.length === PAGE_SIZE);
+    } catch (err) {
+      setError('Failed to load more logs');
+      console.error('Load more error:', err);
+    } finally {
+      loadingMore.current = false;
+    }
+  };
+
   const handleEdit = (log) => {
     setEditingLog(log.id);
     setFormData({
@@ -264,8 +298,10 @@ const HistoryView = () => {
         {logs.length === 0 ? (
           <p>No consumption logs found. Add your first log!</p>
         ) : (
-          <table className="table">
-            <thead>
+          <VirtualTable
+            rows={logs}
+            onEndReached={loadMore}
+            header={
               <tr>
                 <th>Date</th>
                 <th>Bottle Size</th>
@@ -275,35 +311,33 @@ const HistoryView = () => {
                 <th>Cylinder</th>
                 <th>Actions</th>
               </tr>
-            </thead>
-            <tbody>
-              {logs.map((log) => (
-                <tr key={log.id}>
-                  <td>{new Date(log.date).toLocaleDateString()}</td>
-                  <td>{log.bottle_size}</td>
-                  <td>{log.bottle_count}</td>
-                  <td>{Math.round(log.volume_ml)}</td>
-                  <td>{log.co2_pushes}</td>
-                  <td>#{log.cylinder.number}</td>
-                  <td>
-                    <button
-                      className="btn btn-secondary btn-sm"
-                      onClick={() => handleEdit(log)}
-                      style={{ marginRight: '0.5rem' }}
-                    >
-                      Edit
-                    </button>
-                    <button
-                      className="btn btn-danger btn-sm"
-                      onClick={() => handleDelete(log.id)}
-                    >
-                      Delete
-                    </button>
-                  </td>
-                </tr>
-              ))}
-            </tbody>
-          </table>
+            }
+            renderRow={(log, style) => (
+              <tr key={log.id} style={style}>
+                <td>{new Date(log.date).toLocaleDateString()}</td>
+                <td>{log.bottle_size}</td>
+                <td>{log.bottle_count}</td>
+                <td>{Math.round(log.volume_ml)}</td>
+                <td>{log.co2_pushes}</td>
+                <td>#{log.cylinder.number}</td>
+                <td>
+                  <button
+                    className="btn btn-secondary btn-sm"
+                    onClick={() => handleEdit(log)}
+                    style={{ marginRight: '0.5rem' }}
+                  >
+                    Edit
+                  </button>
+                  <button
+                    className="btn btn-danger btn-sm"
+                    onClick={() => handleDelete(log.id)}
+                  >
+                    Delete
+                  </button>
+                </td>
+              </tr>
+            )}
+          />
         )}
       </div>
     </div>
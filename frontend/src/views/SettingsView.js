@@ -1,5 +1,8 @@
 import React, { useState, useEffect } from 'react';
-import { settingsApi, dataApi } from '../services/api';
+import { settingsApi, dataApi, invalidateCache } from '../services/api';
+
+// Stop waiting on an import whose progress hasn't changed for this long
+const IMPORT_STALL_MS = 2 * 60 * 1000;
 
 const SettingsView = () => {
   const [loading, setLoading] = useState(true);
@@ -15,6 +18,8 @@ const SettingsView = () => {
   // Import/Export state
   const [importFile, setImportFile] = useState(null);
   const [importing, setImporting] = useState(false);
+  const [importProgress, setImportProgress] = useState(null);
+  const [resumableJob, setResumableJob] = useState(null);
   const [exporting, setExporting] = useState(false);
 
   useEffect(() => {
@@ -88,31 +93,70 @@ const SettingsView = () => {
     }
   };
 
-  const handleImport = async () => {
-    if (!importFile) {
-      setError('Please select a CSV file to import');
-      return;
-    }
-
+  // Poll a background import job until it finishes, fails or stops making progress
+  const runImport = async (startJob) => {
     try {
       setImporting(true);
-      const response = await dataApi.importCsv(importFile);
-      setSuccess(`Import completed! ${response.data.imported_count} records imported.`);
+      setResumableJob(null);
+      const response = await startJob();
+      
+      let job = response.data;
+      let lastUpdate = job.updated_at;
+      let lastChange = Date.now();
+      while (job.status === 'queued' || job.status === 'running') {
+        await new Promise((resolve) => setTimeout(resolve, 1000));
+        job = (await dataApi.getImportJob(job.id)).data;
+        setImportProgress(job);
+        
+        // The server refreshes updated_at while it holds the job
+        if (job.updated_at !== lastUpdate) {
+          lastUpdate = job.updated_at;
+          lastChange = Date.now();
+        } else if (Date.now() - lastChange > IMPORT_STALL_MS) {
+          break;
+        }
+      }
+      
+      // Imported logs (and any cylinders they created) change every cached view
+      invalidateCache();
       
-      if (response.data.errors && response.data.errors.length > 0) {
-        setError(`Some errors occurred: ${response.data.errors.slice(0, 3).join(', ')}`);
+      if (job.status !== 'completed') {
+        setResumableJob(job);
+        throw new Error(job.status === 'failed'
+          ? job.error_message || 'Import failed'
+          : 'Import stopped making progress');
+      }
+      
+      setSuccess(`Import completed! ${job.imported_count} records imported, ${job.updated_count} updated, ${job.skipped_count} already present.`);
+      
+      if (job.errors && job.errors.length > 0) {
+        setError(`Some errors occurred: ${job.errors.slice(0, 3).join(', ')}`);
       }
       
       setImportFile(null);
       setTimeout(() => setSuccess(null), 5000);
     } catch (err) {
-      setError(err.response?.data?.detail || 'Failed to import CSV');
+      setError(err.response?.data?.detail || err.message || 'Failed to import CSV');
       console.error('Import error:', err);
     } finally {
       setImporting(false);
+      setImportProgress(null);
     }
   };
 
+  const handleImport = async () => {
+    if (!importFile) {
+      setError('Please select a CSV file to import');
+      return;
+    }
+    await runImport(() => dataApi.importCsv(importFile));
+  };
+
+  const handleResumeImport = async () => {
+    setError(null);
+    await runImport(() => dataApi.resumeImportJob(resumableJob.id));
+  };
+
   const handleExport = async () => {
     try {
       setExporting(true);
@@ -175,13 +219,13 @@ const SettingsView = () => {
         <div style={{ marginBottom: '2rem' }}>
           <h3>Import from CSV</h3>
           <p style={{ color: '#6c757d', marginBottom: '1rem' }}>
-            Import consumption data from a CSV file. The CSV should contain columns: date, bottle_size, bottle_count, cylinder_number.
+            Import consumption data from a CSV, Parquet or Arrow file. The file should contain columns: date, bottle_size, bottle_count, cylinder_number.
           </p>
           
           <div className="form-inline" style={{ marginBottom: '1rem' }}>
             <input
               type="file"
-              accept=".csv"
+              accept=".csv,.parquet,.arrow,.feather"
               className="form-control"
               onChange={(e) => setImportFile(e.target.files[0])}
             />
@@ -190,8 +234,21 @@ const SettingsView = () => {
               onClick={handleImport}
               disabled={importing || !importFile}
             >
-              {importing ? 'Importing...' : 'Import CSV'}
+              {importing
+                ? importProgress && importProgress.total_rows
+                  ? `Importing... ${importProgress.processed_rows}/${importProgress.total_rows}`
+                  : 'Importing...'
+                : 'Import CSV'}
             </button>
+            {resumableJob && !importing && (
+              <button
+                className="btn btn-secondary"
+                onClick={handleResumeImport}
+                style={{ marginLeft: '0.5rem' }}
+              >
+                Resume Import ({resumableJob.processed_rows} rows done)
+              </button>
+            )}
           </div>
           
           <button